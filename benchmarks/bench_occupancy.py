@@ -0,0 +1,66 @@
+"""
+Benchmark the per-day occupancy computation behind generate_occupancy_report.
+
+Usage:
+    python benchmarks/bench_occupancy.py [--bookings 1000000] [--days 365]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hotel_management_system.utils import occupancy
+
+def make_stays(count, first_day, span_days, seed=7):
+    rng = random.Random(seed)
+    check_ins = [first_day + rng.randrange(span_days) for _ in range(count)]
+    check_outs = [check_in + rng.randint(1, 14) for check_in in check_ins]
+    return check_ins, check_outs
+
+def legacy_counts(check_ins, check_outs, start_day, end_day):
+    # The previous algorithm: every day re-scans every booking
+    counts = []
+    for day in range(start_day, end_day + 1):
+        counts.append(sum(1 for ci, co in zip(check_ins, check_outs) if ci <= day < co))
+    return counts
+
+def timed(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--legacy-sample', type=int, default=2_000)
+    args = parser.parse_args()
+
+    start_day = date(2024, 1, 1).toordinal()
+    end_day = start_day + args.days - 1
+    check_ins, check_outs = make_stays(args.bookings, start_day - 30, args.days + 60)
+    print(f"{args.bookings:,} bookings, {args.days}-day report")
+
+    python_counts = timed('sweep line (pure Python)', occupancy.count_occupied,
+                          check_ins, check_outs, start_day, end_day, use_numpy=False)
+    if occupancy.np is not None:
+        numpy_counts = timed('sweep line (NumPy)', occupancy.count_occupied,
+                             check_ins, check_outs, start_day, end_day, use_numpy=True)
+        assert numpy_counts == python_counts
+    else:
+        print('sweep line (NumPy)                       skipped, NumPy not installed')
+
+    sample = args.legacy_sample
+    sample_counts = timed(f'legacy day x booking scan ({sample:,})', legacy_counts,
+                          check_ins[:sample], check_outs[:sample], start_day, end_day)
+    assert sample_counts == occupancy.count_occupied(
+        check_ins[:sample], check_outs[:sample], start_day, end_day, use_numpy=False)
+
+if __name__ == '__main__':
+    main()
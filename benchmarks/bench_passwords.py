@@ -0,0 +1,57 @@
+"""
+Benchmark password hashing: logins per second per core at a scrypt cost.
+
+Usage:
+    python benchmarks/bench_passwords.py [--n 16384] [--r 8] [--p 1] [--logins 64] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from hotel_management_system.utils import passwords
+
+def timed(label, func, logins):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed * 1000 / logins:8.1f} ms/login {logins / elapsed:8.1f} logins/s")
+    return logins / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n', type=int, default=passwords.DEFAULT_COST['n'])
+    parser.add_argument('--r', type=int, default=passwords.DEFAULT_COST['r'])
+    parser.add_argument('--p', type=int, default=passwords.DEFAULT_COST['p'])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    salt = os.urandom(passwords.SALT_BYTES)
+    memory = 128 * args.n * args.r / 2 ** 20
+    print(f"scrypt N={args.n} r={args.r} p={args.p}, {memory:.0f} MB per hash, "
+          f"{args.logins} logins, {args.workers} workers")
+
+    def login():
+        passwords.derive_key('correct horse battery staple', salt, args.n, args.r, args.p)
+
+    def serial():
+        for _ in range(args.logins):
+            login()
+
+    def pooled():
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for future in [executor.submit(login) for _ in range(args.logins)]:
+                future.result()
+
+    per_core = timed('one thread', serial, args.logins)
+    total = timed(f'pool of {args.workers}', pooled, args.logins)
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"{'logins/s per core (pooled)':<40} {total / cores:8.1f} "
+          f"(serial {per_core:.1f}, {cores} cores)")
+
+if __name__ == '__main__':
+    main()
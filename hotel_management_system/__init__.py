@@ -1,32 +1,23 @@
 import os
+import click
 from flask import Flask, render_template, redirect, url_for, g
 import sqlite3
 from datetime import datetime
 
 def get_db():
     """Connect to the database."""
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        db.row_factory = sqlite3.Row
-    return db
+    from .utils.db import get_db as get_pooled_db
+    return get_pooled_db()
 
 def close_db(e=None):
-    """Close the database connection."""
-    db = g.pop('_database', None)
-    if db is not None:
-        db.close()
+    """Return the database connection to the pool."""
+    from .utils.db import close_db as close_pooled_db
+    close_pooled_db(e)
 
 def init_db():
-    """Initialize the database."""
-    db = get_db()
-    
-    with current_app.open_resource('schema.sql', mode='r') as f:
-        db.cursor().executescript(f.read())
-    db.commit()
+    """Create the database schema, or upgrade an existing one."""
+    from .utils.migrations import migrate
+    return migrate()
 
 def create_app(test_config=None):
     """Create and configure the application."""
@@ -35,6 +26,37 @@ def create_app(test_config=None):
         SECRET_KEY='walnutmercury_hotel_system',  # Change this in production!
         DATABASE=os.path.join(app.instance_path, 'hotel.db'),
         UPLOAD_FOLDER=os.path.join(app.instance_path, 'uploads'),
+        DB_POOL_SIZE=8,  # Connections shared by all request threads
+        DB_POOL_TIMEOUT=30.0,  # Seconds to wait for a free connection
+        DB_PRAGMAS={},  # Extra PRAGMAs applied once per pooled connection
+        DB_JOURNAL_MODE='WAL',  # Readers keep running while a write commits
+        DB_WRITE_MODE='direct',  # 'queue' funnels writes through one writer thread
+        DB_WRITE_BATCH_SIZE=64,  # Writes group-committed per transaction in queue mode
+        AVAILABILITY_REFRESH_SECONDS=5.0,  # Reload room availability made by other workers
+        DASHBOARD_STATS_TTL=5.0,  # Seconds the admin dashboard counters are cached
+        PAGE_SIZE=50,  # Default rows per page in admin list views
+        MAX_PAGE_SIZE=500,  # Upper bound for a requested page size
+        QUERY_BATCH_SIZE=1000,  # Rows fetched per batch by streamed queries
+        IMPORT_BATCH_SIZE=5000,  # Records written per transaction by bulk imports
+        SNAPSHOT_PATH=None,  # Analytics snapshot file, next to the database by default
+        SNAPSHOT_MAX_AGE=300,  # Seconds before the analytics snapshot is rebuilt
+        REPORT_USE_SNAPSHOT=False,  # Occupancy/revenue reports read the analytics snapshot
+        REPORT_WORKERS=None,  # Report worker processes, one per CPU by default; 1 disables
+        REPORT_PARALLEL_MIN_DAYS=365,  # Shorter report ranges are computed serially
+        REPORT_CACHE_SIZE=128,  # Reports kept per process; 0 disables the report cache
+        REPORT_CACHE_TTL=300.0,  # Upper bound on a cached report's age (other workers' bookings)
+        REFERENCE_CACHE_TTL=60.0,  # Seconds rooms/employees/menu stay cached; 0 disables
+        IDENTITY_CACHE_SIZE=1024,  # Users/guest profiles cached per process; 0 caches per request only
+        IDENTITY_CACHE_TTL=60.0,  # Seconds users/guest profiles stay cached; independent of REFERENCE_CACHE_TTL
+        PASSWORD_HASH_N=2 ** 14,  # scrypt cost; raising it re-hashes passwords on next login
+        PASSWORD_HASH_R=8,  # scrypt block size (memory per hash is 128 * N * r bytes)
+        PASSWORD_HASH_P=1,  # scrypt parallelism
+        PASSWORD_HASH_WORKERS=None,  # Concurrent password hashes, one per CPU by default
+        RATE_LIMIT_ENABLED=True,  # Throttle login, registration and booking attempts
+        RATE_LIMIT_STORAGE='memory',  # 'sqlite' shares the token buckets between workers
+        RATE_LIMIT_MAX_KEYS=50000,  # Token buckets kept per process in memory mode
+        RATE_LIMIT_TRUSTED_PROXIES=0,  # Reverse proxies whose X-Forwarded-For is trusted
+        RATE_LIMITS={},  # Per-scope (tokens per second, burst) overriding ratelimit.DEFAULT_LIMITS
     )
 
     if test_config is None:
@@ -79,33 +101,99 @@ def create_app(test_config=None):
     db_exists = os.path.exists(db_path)
     
     with app.app_context():
+        # Creates a new database or applies only the migrations it is missing
+        init_db()
         if not db_exists:
-            init_db()
             create_default_data()
 
+    @app.cli.command('rebuild-kpis')
+    def rebuild_kpis_command():
+        """Rebuild the daily KPI rollup from bookings."""
+        from .utils.kpis import rebuild_daily_kpis
+        rows = rebuild_daily_kpis()
+        click.echo(f"Rebuilt {rows} daily KPI rows")
+
+    @app.cli.command('build-snapshot')
+    def build_snapshot_command():
+        """Rebuild the columnar booking snapshot used for analytics."""
+        from .utils.snapshot import build_snapshot
+        count = build_snapshot()
+        click.echo(f"Snapshot holds {count} bookings")
+
+    @app.cli.command('report')
+    @click.argument('kind', type=click.Choice(['occupancy', 'revenue']))
+    @click.argument('start_date')
+    @click.argument('end_date')
+    @click.option('--from-bookings', is_flag=True,
+                  help='Recompute from bookings instead of the KPI rollup, in parallel for long ranges.')
+    def report_command(kind, start_date, end_date, from_bookings):
+        """Print an occupancy or revenue report for a date range."""
+        from .utils.admin_utils import generate_occupancy_report, generate_revenue_report
+        if kind == 'occupancy':
+            report = generate_occupancy_report(start_date, end_date, use_rollup=not from_bookings)
+            for date_str in report['dates']:
+                day = report['daily_occupancy'][date_str]
+                click.echo(f"{date_str}  {day['occupied']}/{day['total']}  {day['rate']}%")
+            click.echo(f"Average occupancy {report['average_occupancy']}%")
+        else:
+            report = generate_revenue_report(start_date, end_date, aggregate_in_sql=not from_bookings,
+                                             use_rollup=not from_bookings)
+            for room_type, revenue in sorted(report['revenue_by_room_type'].items()):
+                click.echo(f"{room_type}  {revenue:.2f}")
+            click.echo(f"Total revenue {report['total_revenue']:.2f}")
+
+    @app.cli.command('migrate-db')
+    def migrate_db_command():
+        """Apply pending schema migrations."""
+        from .utils.migrations import migrate, get_schema_version
+        applied = migrate()
+        click.echo(f"Applied {len(applied)} migrations, schema version {get_schema_version()}")
+
+    @app.cli.command('import-data')
+    @click.argument('table', type=click.Choice(['rooms', 'guests', 'bookings']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl', 'json']),
+                  help='File format, guessed from the extension by default.')
+    @click.option('--batch-size', type=int, help='Records written per transaction.')
+    @click.option('--keep-indexes', is_flag=True, help='Maintain indexes during the load.')
+    def import_data_command(table, path, file_format, batch_size, keep_indexes):
+        """Bulk import rooms, guests or bookings from CSV or JSON."""
+        from .utils.imports import import_file
+
+        def progress(stats):
+            click.echo(f"{stats['imported']} imported, {stats['rejected']} rejected, "
+                       f"{stats['rows_per_second']:.0f} rows/s")
+
+        stats = import_file(table, path, file_format=file_format, batch_size=batch_size,
+                            defer_index_maintenance=not keep_indexes, progress=progress)
+        for line, message in stats['errors']:
+            click.echo(f"Line {line}: {message}", err=True)
+        click.echo(f"Imported {stats['imported']} of {stats['read']} {table} records "
+                   f"in {stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} rows/s)")
+
+    @app.cli.command('audit-queries')
+    def audit_queries_command():
+        """Fail if a hot query's plan does a full table scan."""
+        from .utils.query_plans import audit_query_plans
+        checked, failures = audit_query_plans()
+        for failure in failures:
+            click.echo(f"{failure['function']}: {failure['detail']} ({failure['table']})")
+            click.echo(f"    {failure['sql']}")
+        if failures:
+            raise click.ClickException(f"{len(failures)} full table scans in {checked} queries")
+        click.echo(f"Checked {checked} queries, no full table scans")
+
     return app
 
 def create_default_data():
     """Create default data in the database."""
     from .utils.auth import register_user
-    from .utils.db import insert_db
+    from .utils.db import insert_many
     
     # Create default admin user
     register_user('admin', 'admin123', 'admin@hotel.com', 'admin')
     
-    # Create sample rooms
-    rooms = [
-        {'room_number': '101', 'type': 'Standard', 'price': 99.99, 'capacity': 2, 'status': 'available'},
-        {'room_number': '102', 'type': 'Standard', 'price': 99.99, 'capacity': 2, 'status': 'available'},
-        {'room_number': '103', 'type': 'Standard', 'price': 99.99, 'capacity': 2, 'status': 'available'},
-        {'room_number': '201', 'type': 'Deluxe', 'price': 149.99, 'capacity': 2, 'status': 'available'},
-        {'room_number': '202', 'type': 'Deluxe', 'price': 149.99, 'capacity': 2, 'status': 'available'},
-        {'room_number': '301', 'type': 'Suite', 'price': 249.99, 'capacity': 4, 'status': 'available'},
-        {'room_number': '302', 'type': 'Suite', 'price': 249.99, 'capacity': 4, 'status': 'available'},
-    ]
-    
-    for room in rooms:
-        insert_db('rooms', room)
+    # Note: Sample rooms are defined in schema.sql
     
     # Create sample inventory items
     inventory_items = [
@@ -120,9 +208,10 @@ def create_default_data():
         {'item_name': 'Beer', 'quantity': 60, 'category': 'Beverages'},
     ]
     
+    now = datetime.now()
     for item in inventory_items:
-        item['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        insert_db('inventory', item)
+        item['last_updated'] = now.strftime('%Y-%m-%d %H:%M:%S')
+    insert_many('inventory', inventory_items)
     
     # Create sample employees
     employees = [
@@ -137,8 +226,8 @@ def create_default_data():
     ]
     
     for employee in employees:
-        employee['hire_date'] = datetime.now().strftime('%Y-%m-%d')
-        insert_db('employees', employee)
+        employee['hire_date'] = now.strftime('%Y-%m-%d')
+    insert_many('employees', employees)
     
     # Create sample food menu items
     # Note: Food menu items are defined in schema.sql
@@ -1,31 +1,45 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session
+from flask import (
+    Blueprint, Response, render_template, redirect, url_for, request, flash, session,
+    stream_with_context, abort
+)
 from .utils.auth import admin_required, user_required, login_user, register_user, logout_user
-from .utils.db import query_db, insert_db, update_db, delete_db
+from .utils.ratelimit import rate_limited, record_failure
+from .utils.db import query_db, insert_db, update_db, delete_db, get_page_size
 from .utils.admin_utils import (
-    get_dashboard_stats, get_all_guests, get_all_employees, add_employee,
+    get_dashboard_stats, get_all_guests, get_all_employees, add_employee, get_all_rooms,
     get_housekeeping_tasks, assign_housekeeping, update_housekeeping_status,
-    get_inventory_items, add_inventory_item, place_order, get_orders, update_order_status
+    get_inventory_items, add_inventory_item, place_order, get_orders, update_order_status,
+    iter_bookings_in_range, iter_all_bookings, iter_daily_occupancy
 )
+from .utils.exports import iter_csv, iter_gzip
 from .utils.user_utils import (
     get_guest_profile, create_guest_profile, get_user_bookings, get_booking,
     get_available_rooms, create_booking, cancel_booking, get_active_bookings,
     create_room_service_request, get_room_service_requests
 )
-from .utils.food import (
+from .utils.food_utils import (
     get_all_menu_items, get_menu_item, add_menu_item, update_menu_item, 
     create_food_order, get_food_order, get_guest_food_orders, get_active_food_orders,
     update_food_order_status, cancel_food_order, get_menu_categories, search_menu,
     get_daily_specials, get_food_sales_report
 )
-from datetime import datetime
+from datetime import datetime, timedelta
 
 auth_bp = Blueprint('auth', __name__)
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 user_bp = Blueprint('user', __name__, url_prefix='/user')
 food_bp = Blueprint('food', __name__, url_prefix='/food')
 
+def page_args(prefix=''):
+    """Read keyset pagination arguments (limit/after) from the query string.
+    query_page restarts from the first page on a cursor it cannot use."""
+    return {
+        'limit': get_page_size(request.args.get(prefix + 'limit', type=int)),
+        'after': request.args.get(prefix + 'after') or None
+    }
 
 @auth_bp.route('/admin/login', methods=['GET', 'POST'])
+@rate_limited('login', username_failures_only=True)
 def admin_login():
     if request.method == 'POST':
         username = request.form['username']
@@ -36,6 +50,7 @@ def admin_login():
             session['role'] = 'admin'
             return redirect(url_for('admin.dashboard'))
         
+        record_failure('login', username)
         flash('Invalid username or password')
     
     return render_template('admin/login.html')
@@ -46,6 +61,7 @@ def admin_logout():
     return redirect(url_for('auth.admin_login'))
 
 @auth_bp.route('/user/login', methods=['GET', 'POST'])
+@rate_limited('login', username_failures_only=True)
 def user_login():
     if request.method == 'POST':
         username = request.form['username']
@@ -62,11 +78,13 @@ def user_login():
             
             return redirect(url_for('user.dashboard'))
         
+        record_failure('login', username)
         flash('Invalid username or password')
     
     return render_template('user/login.html')
 
 @auth_bp.route('/user/register', methods=['GET', 'POST'])
+@rate_limited('register')
 def user_register():
     if request.method == 'POST':
         username = request.form['username']
@@ -97,13 +115,71 @@ def dashboard():
 @admin_bp.route('/guests')
 @admin_required
 def guests():
-    all_guests = get_all_guests()
+    all_guests = get_all_guests(**page_args())
     return render_template('admin/guests.html', guests=all_guests)
 
+BOOKING_EXPORT_COLUMNS = [
+    'id', 'guest_id', 'guest_name', 'room_id', 'room_number', 'type', 'price',
+    'check_in', 'check_out', 'status', 'created_at'
+]
+
+# Columns of each CSV export
+EXPORT_COLUMNS = {
+    'occupancy': ['date', 'occupied', 'total', 'rate'],
+    'revenue': BOOKING_EXPORT_COLUMNS[:-1] + ['nights', 'revenue'],
+    'bookings': BOOKING_EXPORT_COLUMNS,
+}
+
+@admin_bp.route('/export/<name>.csv', defaults={'compressed': False})
+@admin_bp.route('/export/<name>.csv.gz', defaults={'compressed': True})
+@admin_required
+def export(name, compressed):
+    """Stream a report or the bookings ledger as (gzip-compressed) CSV."""
+    if name not in EXPORT_COLUMNS:
+        abort(404)
+    
+    # Validate the range before streaming starts; errors can't be sent afterwards
+    try:
+        end = datetime.strptime(request.args.get('end_date') or datetime.now().strftime('%Y-%m-%d'), '%Y-%m-%d')
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d') \
+            if request.args.get('start_date') else end - timedelta(days=30)
+    except ValueError:
+        abort(400)
+    start_date = start.strftime('%Y-%m-%d')
+    end_date = end.strftime('%Y-%m-%d')
+    
+    # source=bookings recomputes the counts instead of reading the rollup
+    source = request.args.get('source', 'rollup')
+    if source not in ('rollup', 'bookings'):
+        abort(400)
+    
+    if name == 'occupancy':
+        rows = iter_daily_occupancy(start_date, end_date, use_rollup=source == 'rollup')
+        filename = f'occupancy_{start_date}_{end_date}.csv'
+    elif name == 'revenue':
+        rows = iter_bookings_in_range(start_date, end_date)
+        filename = f'revenue_{start_date}_{end_date}.csv'
+    else:
+        rows = iter_all_bookings(request.args.get('status'))
+        filename = 'bookings.csv'
+    
+    chunks = iter_csv(EXPORT_COLUMNS[name], rows)
+    mimetype = 'text/csv'
+    if compressed:
+        chunks = iter_gzip(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @admin_bp.route('/employees')
 @admin_required
 def employees():
-    all_employees = get_all_employees()
+    all_employees = get_all_employees(**page_args())
     return render_template('admin/employees.html', employees=all_employees)
 
 @admin_bp.route('/add_employee', methods=['POST'])
@@ -126,9 +202,9 @@ def add_employee_route():
 @admin_bp.route('/housekeeping')
 @admin_required
 def housekeeping():
-    tasks = get_housekeeping_tasks()
+    tasks = get_housekeeping_tasks(**page_args())
     housekeeping_employees = get_all_employees(filter_department='Housekeeping')
-    rooms = query_db('SELECT * FROM rooms ORDER BY room_number')
+    rooms = get_all_rooms()
     
     return render_template('admin/housekeeping.html', 
                           housekeeping=tasks,
@@ -170,8 +246,8 @@ def update_housekeeping_status_route():
 @admin_bp.route('/inventory')
 @admin_required
 def inventory():
-    inventory_items = get_inventory_items()
-    orders = get_orders()
+    inventory_items = get_inventory_items(**page_args())
+    orders = get_orders(**page_args('orders_'))
     
     return render_template('admin/inventory.html', 
                           inventory=inventory_items,
@@ -252,6 +328,7 @@ def dashboard():
 
 @user_bp.route('/booking', methods=['GET', 'POST'])
 @user_required
+@rate_limited('booking', username_field=None)
 def booking():
     guest = get_guest_profile(session['user_id'])
     if not guest:
@@ -1,17 +1,7 @@
 
--- Drop tables if they exist
-DROP TABLE IF EXISTS room_service;
-DROP TABLE IF EXISTS food_order_items;
-DROP TABLE IF EXISTS food_orders;
-DROP TABLE IF EXISTS food_menu;
-DROP TABLE IF EXISTS orders;
-DROP TABLE IF EXISTS inventory;
-DROP TABLE IF EXISTS housekeeping;
-DROP TABLE IF EXISTS bookings;
-DROP TABLE IF EXISTS rooms;
-DROP TABLE IF EXISTS guests;
-DROP TABLE IF EXISTS employees;
-DROP TABLE IF EXISTS users;
+-- Latest schema, applied to new databases by utils/migrations.py.
+-- Existing databases are upgraded by the migrations listed there; when
+-- changing this file add a matching migration and bump user_version.
 
 -- Users table for authentication
 CREATE TABLE users (
@@ -67,6 +57,45 @@ CREATE TABLE bookings (
     FOREIGN KEY (room_id) REFERENCES rooms (id)
 );
 
+-- Room-night calendar: one row per booked night, so a room can never be
+-- claimed twice for the same night
+CREATE TABLE room_nights (
+    room_id INTEGER NOT NULL,
+    night DATE NOT NULL,
+    booking_id INTEGER NOT NULL,
+    PRIMARY KEY (room_id, night),
+    FOREIGN KEY (room_id) REFERENCES rooms (id),
+    FOREIGN KEY (booking_id) REFERENCES bookings (id)
+) WITHOUT ROWID;
+
+CREATE INDEX idx_room_nights_booking ON room_nights (booking_id);
+
+-- Daily KPI rollup per room type, maintained as bookings are made and cancelled
+CREATE TABLE daily_kpis (
+    date DATE NOT NULL,
+    room_type TEXT NOT NULL,
+    occupied_rooms INTEGER NOT NULL DEFAULT 0,
+    room_revenue REAL NOT NULL DEFAULT 0,
+    available_rooms INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, room_type)
+) WITHOUT ROWID;
+
+-- Versions of the cached reference data sets, bumped when one changes so
+-- every worker process drops its copy
+CREATE TABLE reference_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+-- Token buckets shared by all workers when RATE_LIMIT_STORAGE is 'sqlite';
+-- a bucket is full again at full_at, so older rows can be pruned
+CREATE TABLE rate_limits (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    full_at REAL NOT NULL
+);
+
 -- Housekeeping table
 CREATE TABLE housekeeping (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -123,9 +152,34 @@ CREATE TABLE food_menu (
     is_gluten_free INTEGER NOT NULL DEFAULT 0,
     is_special INTEGER NOT NULL DEFAULT 0,
     available INTEGER NOT NULL DEFAULT 1,
-    image_path TEXT
+    image_path TEXT,
+    -- Bits 1 vegetarian, 2 vegan, 4 gluten-free, for one-comparison filtering
+    dietary_flags INTEGER GENERATED ALWAYS AS (
+        (is_vegetarian != 0) | ((is_vegan != 0) << 1) | ((is_gluten_free != 0) << 2)
+    ) VIRTUAL
 );
 
+-- Full-text index over menu names and descriptions, kept in sync by triggers
+CREATE VIRTUAL TABLE food_menu_fts USING fts5(
+    name, description, content='food_menu', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER food_menu_fts_insert AFTER INSERT ON food_menu BEGIN
+    INSERT INTO food_menu_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END;
+
+CREATE TRIGGER food_menu_fts_delete AFTER DELETE ON food_menu BEGIN
+    INSERT INTO food_menu_fts (food_menu_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+END;
+
+CREATE TRIGGER food_menu_fts_update AFTER UPDATE OF name, description ON food_menu BEGIN
+    INSERT INTO food_menu_fts (food_menu_fts, rowid, name, description)
+    VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO food_menu_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END;
+
 -- Food orders table
 CREATE TABLE food_orders (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -153,6 +207,33 @@ CREATE TABLE food_order_items (
     FOREIGN KEY (menu_item_id) REFERENCES food_menu (id)
 );
 
+-- Indexes for the hot query predicates
+CREATE INDEX idx_bookings_room_status_dates ON bookings (room_id, status, check_in, check_out);
+CREATE INDEX idx_bookings_status_check_in ON bookings (status, check_in);
+CREATE INDEX idx_bookings_dates ON bookings (check_in, check_out);
+CREATE INDEX idx_bookings_guest ON bookings (guest_id, check_in);
+CREATE INDEX idx_guests_user ON guests (user_id);
+CREATE INDEX idx_guests_name ON guests (name, id);
+CREATE INDEX idx_employees_name ON employees (name, id);
+CREATE INDEX idx_employees_department ON employees (department, name, id);
+CREATE INDEX idx_housekeeping_date_status ON housekeeping (date, status);
+CREATE INDEX idx_housekeeping_status_date ON housekeeping (status, date);
+CREATE INDEX idx_housekeeping_employee ON housekeeping (employee_id);
+CREATE INDEX idx_inventory_name ON inventory (item_name, id);
+CREATE INDEX idx_inventory_category ON inventory (category, item_name, id);
+CREATE INDEX idx_orders_status_date ON orders (status, order_date, id);
+CREATE INDEX idx_orders_date ON orders (order_date, id);
+CREATE INDEX idx_room_service_booking ON room_service (booking_id);
+CREATE INDEX idx_room_service_status_time ON room_service (status, request_time, id);
+CREATE INDEX idx_room_service_time ON room_service (request_time, id);
+CREATE INDEX idx_food_orders_status ON food_orders (status, order_time);
+CREATE INDEX idx_food_orders_guest ON food_orders (guest_id, order_time);
+CREATE INDEX idx_food_order_items_order ON food_order_items (order_id);
+CREATE INDEX idx_rate_limits_full_at ON rate_limits (full_at);
+
+-- Schema version of this file, see utils/migrations.py
+PRAGMA user_version = 6;
+
 -- Insert sample rooms
 INSERT INTO rooms (room_number, type, price, capacity, status)
 VALUES 
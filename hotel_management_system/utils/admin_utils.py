@@ -1,53 +1,101 @@
+import sqlite3
 from flask import current_app
 from datetime import datetime, timedelta
-from . import db
+from . import db, availability, kpis, occupancy, refdata, report_cache, report_executor, snapshot
+from .cache import TTLCache
+
+# Short-lived cache of the dashboard counters, dropped whenever a counted table changes
+_dashboard_cache = TTLCache(ttl=5.0)
+DASHBOARD_TABLES = {'guests', 'employees', 'rooms', 'bookings', 'inventory', 'orders', 'daily_kpis'}
+
+@db.register_write_listener
+def _invalidate_dashboard_stats(tables):
+    if tables is None or tables & DASHBOARD_TABLES:
+        _dashboard_cache.invalidate()
 
 def get_dashboard_stats():
     """
     Get statistics for the admin dashboard.
     
+    All counters come from one aggregate statement and are cached for
+    DASHBOARD_STATS_TTL seconds, or until one of the counted tables is
+    written.
+    
     Returns:
         Dictionary containing count of guests, employees, rooms, bookings, 
         and inventory items.
     """
+    ttl = current_app.config.get('DASHBOARD_STATS_TTL', _dashboard_cache.ttl)
+    return dict(_dashboard_cache.get_or_load(
+        db.get_database_path(), _load_dashboard_stats, ttl
+    ))
+
+def _load_dashboard_stats():
+    counts = db.query_db('''
+        SELECT
+            (SELECT COUNT(*) FROM guests) as guest_count,
+            (SELECT COUNT(*) FROM employees) as employee_count,
+            (SELECT COUNT(*) FROM rooms) as room_count,
+            (SELECT COUNT(*) FROM bookings WHERE status != 'cancelled') as booking_count,
+            (SELECT COUNT(*) FROM inventory) as inventory_count,
+            (SELECT COUNT(*) FROM orders WHERE status = 'pending') as pending_orders,
+            (SELECT COUNT(*) FROM rooms WHERE status = 'occupied') as occupied_rooms
+    ''', one=True)
+    
     stats = {
-        'guest_count': len(db.query_db('SELECT id FROM guests')),
-        'employee_count': len(db.query_db('SELECT id FROM employees')),
-        'room_count': len(db.query_db('SELECT id FROM rooms')),
-        'booking_count': len(db.query_db('SELECT id FROM bookings WHERE status != "cancelled"')),
-        'inventory_count': len(db.query_db('SELECT id FROM inventory')),
-        'pending_orders': len(db.query_db('SELECT id FROM orders WHERE status = "pending"'))
+        'guest_count': counts['guest_count'],
+        'employee_count': counts['employee_count'],
+        'room_count': counts['room_count'],
+        'booking_count': counts['booking_count'],
+        'inventory_count': counts['inventory_count'],
+        'pending_orders': counts['pending_orders']
     }
     
     # Calculate occupancy rate
     total_rooms = stats['room_count']
-    occupied_rooms = len(db.query_db('SELECT id FROM rooms WHERE status = "occupied"'))
+    occupied_rooms = counts['occupied_rooms']
     stats['occupancy_rate'] = round((occupied_rooms / total_rooms * 100), 2) if total_rooms > 0 else 0
     
+    # Tonight's ADR and RevPAR from the daily KPI rollup
+    today = kpis.get_today_kpis()
+    stats['rooms_sold_tonight'] = today['occupied_rooms']
+    stats['adr'] = today['adr']
+    stats['revpar'] = today['revpar']
+    
     return stats
 
-def get_all_guests(with_bookings=False):
+# Bookings of a batch of guests, newest first
+GUEST_BOOKINGS_QUERY = '''
+    SELECT b.*, r.room_number, r.type 
+    FROM bookings b
+    JOIN rooms r ON b.room_id = r.id
+    WHERE b.guest_id IN ({placeholders})
+    ORDER BY b.check_in DESC
+'''
+
+def get_all_guests(with_bookings=False, limit=None, after=None):
     """
-    Get all guests.
+    Get all guests, or one page of them when limit or after is given.
     
     Args:
-        with_bookings: If True, includes bookings for each guest
+        with_bookings: If True, includes bookings for each guest, loaded in
+            batched queries rather than one query per guest
+        limit: Page size
+        after: Cursor of the page to fetch (next_cursor of the previous page)
         
     Returns:
-        List of guest records
+        List (or db.Page) of guest records (dictionaries)
     """
-    guests = db.query_db('SELECT * FROM guests ORDER BY name')
+    rows = db.query_page(
+        'SELECT * FROM guests', [], [],
+        [('name', 'name', 'ASC'), ('id', 'id', 'ASC')],
+        limit, after, paginate=limit is not None or after is not None
+    )
+    guests = db.Page(db.rows_to_dicts(rows))
+    guests.next_cursor = getattr(rows, 'next_cursor', None)
     
     if with_bookings:
-        for guest in guests:
-            bookings = db.query_db('''
-                SELECT b.*, r.room_number, r.type 
-                FROM bookings b
-                JOIN rooms r ON b.room_id = r.id
-                WHERE b.guest_id = ?
-                ORDER BY b.check_in DESC
-            ''', [guest['id']])
-            guest['bookings'] = bookings
+        db.attach_related(guests, GUEST_BOOKINGS_QUERY, 'guest_id', 'bookings')
     
     return guests
 
@@ -59,38 +107,39 @@ def get_guest(guest_id):
         guest_id: ID of the guest
         
     Returns:
-        Guest record or None if not found
+        Guest record (dictionary) including its bookings, or None if not found
     """
     guest = db.query_db('SELECT * FROM guests WHERE id = ?', [guest_id], one=True)
     
     if guest:
-        bookings = db.query_db('''
-            SELECT b.*, r.room_number, r.type 
-            FROM bookings b
-            JOIN rooms r ON b.room_id = r.id
-            WHERE b.guest_id = ?
-            ORDER BY b.check_in DESC
-        ''', [guest_id])
-        guest['bookings'] = bookings
+        guest = db.attach_related([dict(guest)], GUEST_BOOKINGS_QUERY, 'guest_id', 'bookings')[0]
     
     return guest
 
-def get_all_employees(filter_department=None):
+def get_all_employees(filter_department=None, limit=None, after=None):
     """
     Get all employees, optionally filtered by department.
     
     Args:
         filter_department: Department to filter by
+        limit: Page size
+        after: Cursor of the page to fetch (next_cursor of the previous page)
         
     Returns:
-        List of employee records
+        List of employee records, or a db.Page when limit or after is given
     """
+    conditions = []
+    params = []
+    
     if filter_department:
-        return db.query_db(
-            'SELECT * FROM employees WHERE department = ? ORDER BY name',
-            [filter_department]
-        )
-    return db.query_db('SELECT * FROM employees ORDER BY name')
+        conditions.append('department = ?')
+        params.append(filter_department)
+    
+    return refdata.cached('employees', (filter_department, limit, after), lambda: db.query_page(
+        'SELECT * FROM employees', conditions, params,
+        [('name', 'name', 'ASC'), ('id', 'id', 'ASC')],
+        limit, after, paginate=limit is not None or after is not None
+    ))
 
 def add_employee(name, position, department, contact):
     """
@@ -113,7 +162,11 @@ def add_employee(name, position, department, contact):
         'hire_date': datetime.now().strftime('%Y-%m-%d')
     }
     
-    return db.insert_db('employees', data)
+    employee_id = db.insert_db('employees', data)
+    if employee_id:
+        refdata.invalidate('employees')
+    
+    return employee_id
 
 def update_employee(employee_id, data):
     """
@@ -133,6 +186,9 @@ def update_employee(employee_id, data):
         [employee_id]
     )
     
+    if rows_affected:
+        refdata.invalidate('employees')
+    
     return rows_affected is not None and rows_affected > 0
 
 def delete_employee(employee_id):
@@ -160,6 +216,9 @@ def delete_employee(employee_id):
         [employee_id]
     )
     
+    if rows_affected:
+        refdata.invalidate('employees')
+    
     return rows_affected is not None and rows_affected > 0
 
 def get_all_rooms(filter_status=None, filter_type=None):
@@ -188,7 +247,7 @@ def get_all_rooms(filter_status=None, filter_type=None):
     
     query += ' ORDER BY room_number'
     
-    return db.query_db(query, params)
+    return refdata.cached('rooms', (filter_status, filter_type), lambda: db.query_db(query, params))
 
 def add_room(room_number, room_type, price, capacity):
     """
@@ -221,7 +280,15 @@ def add_room(room_number, room_type, price, capacity):
         'status': 'available'
     }
     
-    return db.insert_db('rooms', data)
+    room_id = db.insert_db('rooms', data)
+    
+    if room_id:
+        availability.invalidate()
+        kpis.refresh_available_rooms()
+        report_cache.invalidate()
+        refdata.invalidate('rooms')
+    
+    return room_id
 
 def update_room(room_id, data):
     """
@@ -234,25 +301,49 @@ def update_room(room_id, data):
     Returns:
         True if successful, False otherwise
     """
-    rows_affected = db.update_db(
-        'rooms',
-        data,
-        'id = ?',
-        [room_id]
-    )
+    set_clause = ', '.join([f"{column} = ?" for column in data.keys()])
+    
+    def update(conn):
+        old = conn.execute('SELECT type, price FROM rooms WHERE id = ?', [room_id]).fetchone()
+        rows = conn.execute(
+            f'UPDATE rooms SET {set_clause} WHERE id = ?',
+            list(data.values()) + [room_id]
+        ).rowcount
+        
+        # Keep the rollup in step with the prices the stays are counted at
+        if rows and ('type' in data or 'price' in data):
+            kpis.move_room_stays(conn, room_id, old['type'], old['price'])
+        return rows
+    
+    try:
+        rows_affected = db.run_write(update, tables=['rooms', 'daily_kpis'])
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Update error: {str(e)}")
+        rows_affected = None
+    
+    if 'type' in data:
+        availability.invalidate()
+    if 'type' in data or 'status' in data:
+        kpis.refresh_available_rooms()
+    if 'type' in data or 'price' in data:
+        report_cache.invalidate()
+    if rows_affected:
+        refdata.invalidate('rooms')
     
     return rows_affected is not None and rows_affected > 0
 
-def get_housekeeping_tasks(status=None, date=None):
+def get_housekeeping_tasks(status=None, date=None, limit=None, after=None):
     """
     Get housekeeping tasks, optionally filtered by status or date.
     
     Args:
         status: Task status to filter by
         date: Date to filter by
+        limit: Page size
+        after: Cursor of the page to fetch (next_cursor of the previous page)
         
     Returns:
-        List of housekeeping tasks
+        List of housekeeping tasks, or a db.Page when limit or after is given
     """
     query = '''
         SELECT h.*, r.room_number, e.name as employee_name
@@ -260,21 +351,21 @@ def get_housekeeping_tasks(status=None, date=None):
         JOIN rooms r ON h.room_id = r.id
         JOIN employees e ON h.employee_id = e.id
     '''
+    conditions = []
     params = []
     
-    if status and date:
-        query += ' WHERE h.status = ? AND h.date = ?'
-        params = [status, date]
-    elif status:
-        query += ' WHERE h.status = ?'
-        params = [status]
-    elif date:
-        query += ' WHERE h.date = ?'
-        params = [date]
-    
-    query += ' ORDER BY h.date DESC, r.room_number'
-    
-    return db.query_db(query, params)
+    if status:
+        conditions.append('h.status = ?')
+        params.append(status)
+    if date:
+        conditions.append('h.date = ?')
+        params.append(date)
+    
+    return db.query_page(
+        query, conditions, params,
+        [('h.date', 'date', 'DESC'), ('r.room_number', 'room_number', 'ASC'), ('h.id', 'id', 'ASC')],
+        limit, after, paginate=limit is not None or after is not None
+    )
 
 def assign_housekeeping(room_id, employee_id, date, notes=None):
     """
@@ -324,32 +415,33 @@ def update_housekeeping_status(task_id, status):
     
     return rows_affected is not None and rows_affected > 0
 
-def get_inventory_items(category=None, low_stock=False):
+def get_inventory_items(category=None, low_stock=False, limit=None, after=None):
     """
     Get inventory items, optionally filtered by category or low stock.
     
     Args:
         category: Category to filter by
         low_stock: If True, only returns items with low stock
+        limit: Page size
+        after: Cursor of the page to fetch (next_cursor of the previous page)
         
     Returns:
-        List of inventory items
+        List of inventory items, or a db.Page when limit or after is given
     """
-    query = 'SELECT * FROM inventory'
+    conditions = []
     params = []
     
-    if category and low_stock:
-        query += ' WHERE category = ? AND quantity < 20'
-        params = [category]
-    elif category:
-        query += ' WHERE category = ?'
-        params = [category]
-    elif low_stock:
-        query += ' WHERE quantity < 20'
-    
-    query += ' ORDER BY item_name'
+    if category:
+        conditions.append('category = ?')
+        params.append(category)
+    if low_stock:
+        conditions.append('quantity < 20')
     
-    return db.query_db(query, params)
+    return db.query_page(
+        'SELECT * FROM inventory', conditions, params,
+        [('item_name', 'item_name', 'ASC'), ('id', 'id', 'ASC')],
+        limit, after, paginate=limit is not None or after is not None
+    )
 
 def add_inventory_item(item_name, quantity, category):
     """
@@ -459,30 +551,35 @@ def place_order(item_id, quantity):
     
     return db.insert_db('orders', data)
 
-def get_orders(status=None):
+def get_orders(status=None, limit=None, after=None):
     """
     Get orders, optionally filtered by status.
     
     Args:
         status: Status to filter by
+        limit: Page size
+        after: Cursor of the page to fetch (next_cursor of the previous page)
         
     Returns:
-        List of orders
+        List of orders, or a db.Page when limit or after is given
     """
     query = '''
         SELECT o.*, i.item_name, i.category
         FROM orders o
         JOIN inventory i ON o.item_id = i.id
     '''
+    conditions = []
     params = []
     
     if status:
-        query += ' WHERE o.status = ?'
-        params = [status]
-    
-    query += ' ORDER BY o.order_date DESC'
+        conditions.append('o.status = ?')
+        params.append(status)
     
-    return db.query_db(query, params)
+    return db.query_page(
+        query, conditions, params,
+        [('o.order_date', 'order_date', 'DESC'), ('o.id', 'id', 'DESC')],
+        limit, after, paginate=limit is not None or after is not None
+    )
 
 def update_order_status(order_id, status):
     """
@@ -517,15 +614,17 @@ def update_order_status(order_id, status):
     
     return rows_affected is not None and rows_affected > 0
 
-def get_room_service_requests(status=None):
+def get_room_service_requests(status=None, limit=None, after=None):
     """
     Get room service requests, optionally filtered by status.
     
     Args:
         status: Status to filter by
+        limit: Page size
+        after: Cursor of the page to fetch (next_cursor of the previous page)
         
     Returns:
-        List of room service requests
+        List of room service requests, or a db.Page when limit or after is given
     """
     query = '''
         SELECT rs.*, b.guest_id, g.name as guest_name, r.room_number
@@ -534,15 +633,18 @@ def get_room_service_requests(status=None):
         JOIN guests g ON b.guest_id = g.id
         JOIN rooms r ON b.room_id = r.id
     '''
+    conditions = []
     params = []
     
     if status:
-        query += ' WHERE rs.status = ?'
-        params = [status]
+        conditions.append('rs.status = ?')
+        params.append(status)
     
-    query += ' ORDER BY rs.request_time DESC'
-    
-    return db.query_db(query, params)
+    return db.query_page(
+        query, conditions, params,
+        [('rs.request_time', 'request_time', 'DESC'), ('rs.id', 'id', 'DESC')],
+        limit, after, paginate=limit is not None or after is not None
+    )
 
 def update_room_service_status(request_id, status):
     """
@@ -569,59 +671,157 @@ def update_room_service_status(request_id, status):
     
     return rows_affected is not None and rows_affected > 0
 
-def generate_occupancy_report(start_date, end_date):
+# Nights of a stay inside the :start_date to :end_date window
+NIGHTS_IN_RANGE_SQL = '''
+    MAX(0, CAST(julianday(MIN(b.check_out, :end_date))
+                - julianday(MAX(b.check_in, :start_date)) AS INTEGER))
+'''
+
+BOOKINGS_IN_RANGE_SQL = '''
+    b.check_in <= :end_date AND b.check_out >= :start_date
+    AND b.status != 'cancelled'
+'''
+
+def iter_bookings_in_range(start_date, end_date, batch_size=None):
     """
-    Generate a room occupancy report for a date range.
+    Stream the non-cancelled bookings overlapping a date range, for reports
+    and exports over many bookings.
     
     Args:
         start_date: Start date
         end_date: End date
+        batch_size: Rows fetched per batch
         
     Returns:
-        Dictionary with report data
-    """
-    # Get all bookings in the date range
-    bookings = db.query_db('''
-        SELECT b.*, r.room_number, r.type, g.name as guest_name
+        Generator of booking rows with room, guest, day number, nights in
+        range and revenue columns, ordered by check-in
+    """
+    return db.iter_query(f'''
+        SELECT b.*, r.room_number, r.type, r.price, g.name as guest_name,
+               {occupancy.sql_day('b.check_in')} as check_in_day,
+               {occupancy.sql_day('b.check_out')} as check_out_day,
+               {NIGHTS_IN_RANGE_SQL} as nights,
+               {NIGHTS_IN_RANGE_SQL} * r.price as revenue
         FROM bookings b
         JOIN rooms r ON b.room_id = r.id
         JOIN guests g ON b.guest_id = g.id
-        WHERE (b.check_in BETWEEN ? AND ?) OR
-              (b.check_out BETWEEN ? AND ?) OR
-              (b.check_in <= ? AND b.check_out >= ?)
-        AND b.status != "cancelled"
+        WHERE {BOOKINGS_IN_RANGE_SQL}
         ORDER BY b.check_in
-    ''', [start_date, end_date, start_date, end_date, start_date, end_date])
-    
-    # Calculate occupancy rate for each day
-    date_range = []
-    current_date = datetime.strptime(start_date, '%Y-%m-%d')
-    end = datetime.strptime(end_date, '%Y-%m-%d')
-    total_rooms = len(db.query_db('SELECT id FROM rooms'))
+    ''', {'start_date': start_date, 'end_date': end_date}, batch_size)
+
+def iter_all_bookings(status=None, batch_size=None):
+    """
+    Stream every booking with its room and guest, for the bookings export.
     
-    daily_occupancy = {}
+    Args:
+        status: Optional booking status filter
+        batch_size: Rows fetched per batch
+        
+    Returns:
+        Generator of booking rows ordered by ID
+    """
+    query = '''
+        SELECT b.*, r.room_number, r.type, r.price, g.name as guest_name
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        JOIN guests g ON b.guest_id = g.id
+    '''
+    params = []
+    if status:
+        query += ' WHERE b.status = ?'
+        params.append(status)
+    query += ' ORDER BY b.id'
+    return db.iter_query(query, params, batch_size)
+
+def iter_daily_occupancy(start_date, end_date, use_rollup=True):
+    """
+    Yield the daily rows of the occupancy report, for the occupancy export.
     
-    while current_date <= end:
-        date_str = current_date.strftime('%Y-%m-%d')
-        date_range.append(date_str)
+    Args:
+        start_date: Start date
+        end_date: End date
+        use_rollup: If False, counts are recomputed from bookings, in
+            parallel slices for long ranges
         
-        # Count occupied rooms for this day
-        occupied = 0
-        for booking in bookings:
-            check_in = datetime.strptime(booking['check_in'], '%Y-%m-%d')
-            check_out = datetime.strptime(booking['check_out'], '%Y-%m-%d')
-            
-            if check_in <= current_date < check_out:
-                occupied += 1
+    Returns:
+        Generator of dictionaries with date, occupied, total and rate
+    """
+    report = generate_occupancy_report(start_date, end_date, use_rollup=use_rollup)
+    for date_str in report['dates']:
+        yield {'date': date_str, **report['daily_occupancy'][date_str]}
+
+def generate_occupancy_report(start_date, end_date, use_rollup=True, include_bookings=False,
+                              use_cache=True, use_snapshot=None):
+    """
+    Generate a room occupancy report for a date range.
+    
+    Reports are cached until a booking change touches their range.
+    By default no bookings are kept: counts come from the rollup, or from
+    report_executor, which sweeps long ranges in parallel slices, so memory
+    stays flat however many bookings the range holds. Only
+    include_bookings=True loads the range's bookings into the report;
+    listings should stream iter_bookings_in_range instead.
+    
+    Args:
+        start_date: Start date
+        end_date: End date
+        use_rollup: If True, daily counts are read from the daily_kpis rollup
+            instead of being recomputed from bookings
+        include_bookings: Whether the report lists the bookings, held in
+            memory for the whole range
+        use_cache: Whether to serve the report from the report cache
+        use_snapshot: If True, daily counts are read from the booking snapshot,
+            up to SNAPSHOT_MAX_AGE seconds old; defaults to REPORT_USE_SNAPSHOT
         
+    Returns:
+        Dictionary with report data
+    """
+    if use_snapshot is None:
+        use_snapshot = current_app.config.get('REPORT_USE_SNAPSHOT', False)
+    
+    if use_cache:
+        return report_cache.get_or_load(
+            'occupancy', start_date, end_date, (use_rollup, include_bookings, use_snapshot),
+            lambda: generate_occupancy_report(start_date, end_date, use_rollup,
+                                              include_bookings, use_cache=False,
+                                              use_snapshot=use_snapshot)
+        )
+    
+    bookings = []
+    if include_bookings:
+        bookings = list(iter_bookings_in_range(start_date, end_date))
+    
+    total_rooms = db.query_db('SELECT COUNT(*) AS count FROM rooms', one=True)['count']
+    
+    start_day, end_day = occupancy.day_range(start_date, end_date)
+    date_range = occupancy.day_labels(start_day, end_day)
+    
+    if use_snapshot:
+        daily_counts = snapshot.get_snapshot().occupancy(start_date, end_date)
+        occupied_counts = [daily_counts[date_str] for date_str in date_range]
+    elif use_rollup:
+        daily_kpis = kpis.get_daily_kpis(start_date, end_date)
+        occupied_counts = [daily_kpis[date_str]['occupied_rooms'] for date_str in date_range]
+    elif include_bookings:
+        # Count occupied rooms for every day in one sweep over the bookings
+        occupied_counts = occupancy.count_occupied(
+            [booking['check_in_day'] for booking in bookings],
+            [booking['check_out_day'] for booking in bookings],
+            start_day,
+            end_day
+        )
+    else:
+        # Long ranges are swept in slices across worker processes
+        occupied_counts = report_executor.occupied_counts(start_date, end_date)
+    
+    daily_occupancy = {}
+    for date_str, occupied in zip(date_range, occupied_counts):
         rate = round((occupied / total_rooms * 100), 2) if total_rooms > 0 else 0
         daily_occupancy[date_str] = {
             'occupied': occupied,
             'total': total_rooms,
             'rate': rate
         }
-        
-        current_date += timedelta(days=1)
     
     # Calculate average occupancy for the period
     total_rate = sum(day['rate'] for day in daily_occupancy.values())
@@ -636,61 +836,89 @@ def generate_occupancy_report(start_date, end_date):
         'average_occupancy': avg_occupancy
     }
 
-def generate_revenue_report(start_date, end_date):
+def generate_revenue_report(start_date, end_date, aggregate_in_sql=True, use_rollup=True,
+                            include_bookings=False, use_cache=True, use_snapshot=None):
     """
     Generate a revenue report for a date range.
     
+    Nights inside the range are computed arithmetically from the stay
+    boundaries. Revenue by room type is read from the daily_kpis rollup,
+    or, with use_rollup=False, summed by SQLite in one grouped query or in
+    (vectorized) Python when aggregate_in_sql is False; without bookings
+    in the report that runs in report_executor, in parallel for long ranges.
+    By default the report holds no bookings and its memory does not grow
+    with the range; include_bookings=True loads every booking in the range.
+    
     Args:
         start_date: Start date
-        end_date: End date
+        end_date: End date (exclusive for nights)
+        aggregate_in_sql: Whether SQLite aggregates revenue by room type
+        use_rollup: Whether revenue by room type comes from the rollup
+        include_bookings: Whether the report lists the bookings, held in
+            memory for the whole range
+        use_cache: Whether to serve the report from the report cache
+        use_snapshot: Whether revenue by room type comes from the booking
+            snapshot, up to SNAPSHOT_MAX_AGE seconds old; defaults to
+            REPORT_USE_SNAPSHOT
         
     Returns:
         Dictionary with report data
     """
-    # Get all bookings in the date range
-    bookings = db.query_db('''
-        SELECT b.*, r.room_number, r.type, r.price, g.name as guest_name
-        FROM bookings b
-        JOIN rooms r ON b.room_id = r.id
-        JOIN guests g ON b.guest_id = g.id
-        WHERE (b.check_in BETWEEN ? AND ?) OR
-              (b.check_out BETWEEN ? AND ?) OR
-              (b.check_in <= ? AND b.check_out >= ?)
-        AND b.status != "cancelled"
-        ORDER BY b.check_in
-    ''', [start_date, end_date, start_date, end_date, start_date, end_date])
+    if use_snapshot is None:
+        use_snapshot = current_app.config.get('REPORT_USE_SNAPSHOT', False)
     
-    # Calculate revenue for each booking
-    total_revenue = 0
-    revenue_by_room_type = {}
+    if use_cache:
+        return report_cache.get_or_load(
+            'revenue', start_date, end_date,
+            (aggregate_in_sql, use_rollup, include_bookings, use_snapshot),
+            lambda: generate_revenue_report(start_date, end_date, aggregate_in_sql, use_rollup,
+                                            include_bookings, use_cache=False,
+                                            use_snapshot=use_snapshot)
+        )
     
-    for booking in bookings:
-        check_in = datetime.strptime(booking['check_in'], '%Y-%m-%d')
-        check_out = datetime.strptime(booking['check_out'], '%Y-%m-%d')
-        
-        # Calculate days in the date range
-        days = 0
-        current = max(check_in, datetime.strptime(start_date, '%Y-%m-%d'))
-        end = min(check_out, datetime.strptime(end_date, '%Y-%m-%d'))
-        
-        while current < end:
-            days += 1
-            current += timedelta(days=1)
-        
-        revenue = days * booking['price']
-        booking['revenue'] = revenue
-        total_revenue += revenue
-        
-        # Track revenue by room type
-        room_type = booking['type']
-        if room_type not in revenue_by_room_type:
-            revenue_by_room_type[room_type] = 0
-        revenue_by_room_type[room_type] += revenue
+    bookings = []
+    if include_bookings:
+        bookings = list(iter_bookings_in_range(start_date, end_date))
+    
+    if use_snapshot:
+        revenue_by_room_type = snapshot.get_snapshot().revenue_by_room_type(start_date, end_date)
+    elif use_rollup:
+        rows = db.query_db('''
+            SELECT room_type, SUM(room_revenue) as revenue
+            FROM daily_kpis
+            WHERE date >= ? AND date < ?
+            GROUP BY room_type
+            HAVING SUM(occupied_rooms) > 0
+        ''', [start_date, end_date])
+        revenue_by_room_type = {row['room_type']: row['revenue'] for row in rows}
+    elif aggregate_in_sql:
+        rows = db.query_db(f'''
+            SELECT r.type, SUM({NIGHTS_IN_RANGE_SQL} * r.price) as revenue
+            FROM bookings b
+            JOIN rooms r ON b.room_id = r.id
+            JOIN guests g ON b.guest_id = g.id
+            WHERE {BOOKINGS_IN_RANGE_SQL}
+            GROUP BY r.type
+        ''', {'start_date': start_date, 'end_date': end_date})
+        revenue_by_room_type = {row['type']: row['revenue'] for row in rows}
+    elif include_bookings:
+        start_day, stop_day = occupancy.day_range(start_date, end_date)
+        _, revenue_by_room_type = occupancy.revenue_by_type(
+            [booking['check_in_day'] for booking in bookings],
+            [booking['check_out_day'] for booking in bookings],
+            [booking['price'] for booking in bookings],
+            [booking['type'] for booking in bookings],
+            start_day,
+            stop_day
+        )
+    else:
+        # Long ranges are summed in slices across worker processes
+        revenue_by_room_type = report_executor.revenue_by_room_type(start_date, end_date)
     
     return {
         'start_date': start_date,
         'end_date': end_date,
         'bookings': bookings,
-        'total_revenue': total_revenue,
+        'total_revenue': sum(revenue_by_room_type.values()),
         'revenue_by_room_type': revenue_by_room_type
-    }
\ No newline at end of file
+    }
@@ -1,44 +1,43 @@
 from functools import wraps
 from flask import request, redirect, url_for, flash, session, g
 import sqlite3
-import hashlib
-
-def get_db():
-    """Connect to the database."""
-    db = getattr(g, '_database', None)
-    if db is None:
-        db = g._database = sqlite3.connect('hotel.db')
-        db.row_factory = sqlite3.Row
-    return db
-
-def query_db(query, args=(), one=False):
-    """Query the database."""
-    cur = get_db().execute(query, args)
-    rv = cur.fetchall()
-    cur.close()
-    return (rv[0] if rv else None) if one else rv
-
-def close_db(exception):
-    """Close the database connection."""
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+from .db import get_db, query_db, close_db, run_write
+from . import identity, passwords
 
 def hash_password(password):
-    """Hash a password for storing."""
-    # In a production environment, use a more secure hashing method like bcrypt
-    # This is a simple SHA-256 hash for demonstration purposes
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash a password for storing with scrypt, off the request thread."""
+    return passwords.hash_password(password)
 
 def verify_password(stored_password, provided_password):
-    """Verify a stored password against a provided password."""
-    return stored_password == hash_password(provided_password)
+    """Verify a stored password (scrypt or legacy SHA-256) against a provided password."""
+    return passwords.verify_password(stored_password, provided_password)
+
+def upgrade_password_hash(user_id, password):
+    """Replace a legacy or outdated password hash after a successful login."""
+    hashed_password = hash_password(password)
+    try:
+        run_write(lambda db: db.execute(
+            'UPDATE users SET password = ? WHERE id = ?',
+            (hashed_password, user_id)
+        ), tables=['users'])
+        identity.invalidate()
+    except sqlite3.Error:
+        # The old hash still works; try again on the next login
+        pass
 
 def login_user(username, password):
     """Attempt to log in a user."""
     user = query_db('SELECT * FROM users WHERE username = ?', [username], one=True)
     
-    if user and verify_password(user['password'], password):
+    if user is None:
+        # Spend the same hashing time as a wrong password so response times
+        # do not tell which usernames exist
+        verify_password(passwords.dummy_hash(), password)
+        return False, None
+    
+    if verify_password(user['password'], password):
+        if passwords.needs_rehash(user['password']):
+            upgrade_password_hash(user['id'], password)
         session['user_id'] = user['id']
         session['username'] = user['username']
         session['role'] = user['role']
@@ -56,13 +55,11 @@ def register_user(username, password, email, role='user'):
     hashed_password = hash_password(password)
     
     # Insert the new user
-    db = get_db()
     try:
-        db.execute(
+        run_write(lambda db: db.execute(
             'INSERT INTO users (username, password, email, role) VALUES (?, ?, ?, ?)',
             (username, hashed_password, email, role)
-        )
-        db.commit()
+        ), tables=['users'])
         return True, "Registration successful"
     except sqlite3.Error as e:
         return False, str(e)
@@ -82,9 +79,7 @@ def get_current_user():
     if not is_logged_in():
         return None
     
-    user_id = session.get('user_id')
-    user = query_db('SELECT * FROM users WHERE id = ?', [user_id], one=True)
-    return user
+    return identity.load_user(session.get('user_id'))
 
 def is_admin():
     """Check if the current user is an admin."""
@@ -112,22 +107,20 @@ def user_required(f):
 
 def has_guest_profile(user_id):
     """Check if a user has a guest profile."""
-    guest = query_db('SELECT * FROM guests WHERE user_id = ?', [user_id], one=True)
-    return guest is not None
+    return identity.load_guest(user_id) is not None
 
 def create_guest_profile(user_id, name, phone, address):
     """Create a guest profile for a user."""
-    db = get_db()
     try:
-        db.execute(
+        run_write(lambda db: db.execute(
             'INSERT INTO guests (user_id, name, phone, address) VALUES (?, ?, ?, ?)',
             (user_id, name, phone, address)
-        )
-        db.commit()
+        ), tables=['guests'])
+        identity.invalidate()
         return True, "Profile created successfully"
     except sqlite3.Error as e:
         return False, str(e)
 
 def get_guest_profile(user_id):
     """Get the guest profile for a user."""
-    return query_db('SELECT * FROM guests WHERE user_id = ?', [user_id], one=True)
\ No newline at end of file
+    return identity.load_guest(user_id)
\ No newline at end of file
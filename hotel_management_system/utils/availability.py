@@ -0,0 +1,304 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from flask import current_app, has_app_context
+from . import db
+
+# Booking statuses that hold a room
+ACTIVE_STATUSES = ('confirmed', 'checked_in')
+
+def to_day(value):
+    """
+    Convert a YYYY-MM-DD string (or date) to a day ordinal.
+    """
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(value[:10]).toordinal()
+
+def stay_nights(check_in, check_out):
+    """
+    List the nights of a stay.
+    Args:
+        check_in: Check-in date (YYYY-MM-DD)
+        check_out: Check-out date (YYYY-MM-DD)
+    Returns:
+        List of YYYY-MM-DD strings, check-in included, check-out excluded
+    """
+    first = date.fromisoformat(check_in[:10])
+    count = to_day(check_out) - first.toordinal()
+    return [(first + timedelta(days=n)).isoformat() for n in range(count)]
+
+def claim_nights(conn, booking_id, room_id, check_in, check_out):
+    """
+    Claim every night of a stay in the room_nights calendar.
+    Must run inside the transaction that creates the booking.
+    Args:
+        conn: Connection holding the write transaction
+        booking_id: ID of the booking claiming the nights
+        room_id: ID of the room
+        check_in: Check-in date (YYYY-MM-DD)
+        check_out: Check-out date (YYYY-MM-DD)
+    Raises:
+        sqlite3.IntegrityError if any night is already taken
+    """
+    conn.executemany(
+        'INSERT INTO room_nights (room_id, night, booking_id) VALUES (?, ?, ?)',
+        [(room_id, night, booking_id) for night in stay_nights(check_in, check_out)]
+    )
+
+def release_nights(conn, booking_id):
+    """
+    Release the nights claimed by a booking.
+    Args:
+        conn: Connection holding the write transaction
+        booking_id: ID of the booking
+    """
+    conn.execute('DELETE FROM room_nights WHERE booking_id = ?', [booking_id])
+
+def fill_room_nights(conn):
+    """
+    Refill the room_nights calendar from active bookings, inside the
+    caller's transaction.
+    Args:
+        conn: Connection holding the write transaction
+    Returns:
+        Number of nights claimed
+    """
+    conn.execute('DELETE FROM room_nights')
+    bookings = conn.execute(
+        f'''
+        SELECT id, room_id, check_in, check_out
+        FROM bookings
+        WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))})
+        ORDER BY check_in, id
+        ''',
+        ACTIVE_STATUSES
+    ).fetchall()
+    claimed = 0
+    for booking in bookings:
+        # Legacy data may hold overlapping stays; the earliest keeps the night
+        cursor = conn.executemany(
+            'INSERT OR IGNORE INTO room_nights (room_id, night, booking_id) VALUES (?, ?, ?)',
+            [(booking['room_id'], night, booking['id'])
+             for night in stay_nights(booking['check_in'], booking['check_out'])]
+        )
+        claimed += cursor.rowcount
+    return claimed
+
+def rebuild_room_nights():
+    """
+    Rebuild the room_nights calendar from active bookings.
+    Returns:
+        Number of nights claimed
+    """
+    return db.run_write(fill_room_nights, tables=['room_nights'])
+
+class RoomCalendar:
+    """
+    Sorted stays of a single room.
+
+    Stays are kept ordered by check-in together with a running maximum of
+    check-out days, so an overlap test is one binary search even when
+    legacy data contains overlapping stays.
+    """
+
+    def __init__(self):
+        self.stays = []  # (check_in, check_out, booking_id), sorted
+        self.max_end = []
+
+    def add(self, booking_id, check_in, check_out):
+        stay = (check_in, check_out, booking_id)
+        insort(self.stays, stay)
+        self._rebuild_max_end(bisect_left(self.stays, stay))
+
+    def remove(self, booking_id):
+        for i, stay in enumerate(self.stays):
+            if stay[2] == booking_id:
+                del self.stays[i]
+                self._rebuild_max_end(i)
+                return True
+        return False
+
+    def is_free(self, check_in, check_out):
+        # Stays starting before check_out are a prefix; one of them
+        # overlaps iff the latest check-out among them is after check_in
+        i = bisect_left(self.stays, (check_out,))
+        return i == 0 or self.max_end[i - 1] <= check_in
+
+    def _rebuild_max_end(self, start):
+        del self.max_end[start:]
+        running = self.max_end[-1] if self.max_end else None
+        for stay in self.stays[start:]:
+            running = stay[1] if running is None else max(running, stay[1])
+            self.max_end.append(running)
+
+class AvailabilityIndex:
+    """
+    In-memory availability of every room, loaded from rooms and bookings.
+
+    create_booking and cancel_booking keep it in sync; it is reloaded from
+    the database after AVAILABILITY_REFRESH_SECONDS to pick up bookings
+    made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._room_types = {}
+        self._calendars = {}
+        self._booking_rooms = {}
+        self._loaded_at = None
+
+    def load(self):
+        """
+        (Re)load rooms and active bookings from the database.
+        """
+        rooms = db.query_db('SELECT id, type FROM rooms')
+        bookings = db.query_db(
+            f'''
+            SELECT id, room_id, check_in, check_out
+            FROM bookings
+            WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))})
+            ORDER BY room_id, check_in
+            ''',
+            ACTIVE_STATUSES
+        )
+
+        room_types = {room['id']: room['type'] for room in rooms}
+        calendars = {room_id: RoomCalendar() for room_id in room_types}
+        booking_rooms = {}
+        for booking in bookings:
+            calendar = calendars.setdefault(booking['room_id'], RoomCalendar())
+            calendar.stays.append(
+                (to_day(booking['check_in']), to_day(booking['check_out']), booking['id'])
+            )
+            booking_rooms[booking['id']] = booking['room_id']
+        for calendar in calendars.values():
+            calendar.stays.sort()
+            calendar._rebuild_max_end(0)
+
+        with self._lock:
+            self._room_types = room_types
+            self._calendars = calendars
+            self._booking_rooms = booking_rooms
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        Force a reload on the next lookup.
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self):
+        max_age = 5.0
+        if has_app_context():
+            max_age = current_app.config.get('AVAILABILITY_REFRESH_SECONDS', max_age)
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > max_age:
+            self.load()
+
+    def is_room_free(self, room_id, check_in, check_out):
+        """
+        Check whether a room has no active booking overlapping a stay.
+        Args:
+            room_id: ID of the room
+            check_in: Check-in date (YYYY-MM-DD)
+            check_out: Check-out date (YYYY-MM-DD)
+        Returns:
+            True if the room exists and is free for every night of the stay
+        """
+        self._ensure_fresh()
+        room_id = int(room_id)
+        with self._lock:
+            if room_id not in self._room_types:
+                return False
+            calendar = self._calendars.get(room_id)
+            return calendar is None or calendar.is_free(to_day(check_in), to_day(check_out))
+
+    def free_rooms(self, check_in, check_out, room_type=None):
+        """
+        Get the rooms free for a whole stay.
+        Args:
+            check_in: Check-in date (YYYY-MM-DD)
+            check_out: Check-out date (YYYY-MM-DD)
+            room_type: Optional room type filter
+        Returns:
+            List of room IDs
+        """
+        self._ensure_fresh()
+        start, end = to_day(check_in), to_day(check_out)
+        with self._lock:
+            return [
+                room_id for room_id, kind in self._room_types.items()
+                if (room_type is None or kind == room_type)
+                and (room_id not in self._calendars or self._calendars[room_id].is_free(start, end))
+            ]
+
+    def booking_added(self, booking_id, room_id, check_in, check_out):
+        """
+        Record a newly created active booking.
+        """
+        room_id = int(room_id)
+        with self._lock:
+            if booking_id in self._booking_rooms:
+                return
+            calendar = self._calendars.setdefault(room_id, RoomCalendar())
+            calendar.add(booking_id, to_day(check_in), to_day(check_out))
+            self._booking_rooms[booking_id] = room_id
+
+    def booking_removed(self, booking_id):
+        """
+        Forget a booking that no longer holds its room.
+        """
+        with self._lock:
+            room_id = self._booking_rooms.pop(booking_id, None)
+            if room_id is not None:
+                self._calendars[room_id].remove(booking_id)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index():
+    """
+    Get the availability index for the configured database.
+    Returns:
+        AvailabilityIndex shared by the process
+    """
+    key = db.get_database_path()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = AvailabilityIndex()
+        return index
+
+def is_room_free(room_id, check_in, check_out):
+    """
+    Check whether a room is free for a stay. See AvailabilityIndex.is_room_free.
+    """
+    return get_index().is_room_free(room_id, check_in, check_out)
+
+def free_rooms(check_in, check_out, room_type=None):
+    """
+    Get the IDs of rooms free for a stay. See AvailabilityIndex.free_rooms.
+    """
+    return get_index().free_rooms(check_in, check_out, room_type)
+
+def booking_added(booking_id, room_id, check_in, check_out):
+    """
+    Record a new active booking in the availability index.
+    """
+    get_index().booking_added(booking_id, room_id, check_in, check_out)
+
+def booking_removed(booking_id):
+    """
+    Release a cancelled booking's nights in the availability index.
+    """
+    get_index().booking_removed(booking_id)
+
+def invalidate():
+    """
+    Reload the availability index on next use, e.g. after room changes.
+    """
+    get_index().invalidate()
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire after a time-to-live.
+    Entries can also be dropped explicitly, e.g. from a db write listener.
+    """
+
+    def __init__(self, ttl=5.0):
+        """
+        Args:
+            ttl: Default seconds an entry stays valid
+        """
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Get a cached value.
+        Returns:
+            The value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value.
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Seconds the value stays valid, defaults to the cache TTL
+        """
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Get a cached value, computing and storing it on a miss.
+        Args:
+            key: Cache key
+            loader: Callable returning the value
+            ttl: Seconds the value stays valid, defaults to the cache TTL
+        Returns:
+            The cached or freshly loaded value
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry, or every entry when key is None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+class LRUCache:
+    """
+    Thread-safe cache holding at most max_size entries, evicting the least
+    recently used. Entries may also expire after a time-to-live.
+    """
+
+    def __init__(self, max_size=128, ttl=None):
+        """
+        Args:
+            max_size: Maximum number of entries
+            ttl: Seconds an entry stays valid, or None to keep it until evicted
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Get a cached value and mark it as recently used.
+        Returns:
+            The value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entries over max_size.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """
+        Get a cached value, computing and storing it on a miss.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry, or every entry when key is None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """
+        Drop the entries whose key satisfies predicate.
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def __len__(self):
+        return len(self._entries)
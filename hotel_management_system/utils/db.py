@@ -1,40 +1,105 @@
+import base64
+import json
 import sqlite3
 import os
-from flask import g, current_app
+from functools import lru_cache
+from itertools import chain
+from flask import g, current_app, has_app_context
+from .pool import get_pool
+from .writer import get_write_queue
 
 # Database file path
 DATABASE = 'hotel.db'
 
+def get_database_path():
+    """
+    Get the path of the configured database.
+    Returns:
+        The app's DATABASE setting, or the module default outside an app context
+    """
+    if has_app_context():
+        return current_app.config.get('DATABASE', DATABASE)
+    return DATABASE
+
+def get_pragmas():
+    """
+    Get the PRAGMAs applied to every new connection.
+    The journal mode comes from DB_JOURNAL_MODE (WAL by default, which lets
+    readers keep working while a write is in progress); DB_PRAGMAS overrides.
+    Returns:
+        Dictionary of PRAGMA name: value pairs
+    """
+    config = current_app.config if has_app_context() else {}
+    journal_mode = config.get('DB_JOURNAL_MODE', 'WAL')
+    pragmas = {'journal_mode': journal_mode}
+    if journal_mode.upper() == 'WAL':
+        # Durable at checkpoint time; safe against corruption in WAL mode
+        pragmas['synchronous'] = 'NORMAL'
+    pragmas.update(config.get('DB_PRAGMAS') or {})
+    return pragmas
+
+def get_connection_pool():
+    """
+    Get the process-wide connection pool for the configured database.
+    Pool size and checkout timeout come from the DB_POOL_SIZE and
+    DB_POOL_TIMEOUT settings.
+    Returns:
+        ConnectionPool shared by every blueprint
+    """
+    config = current_app.config if has_app_context() else {}
+    return get_pool(
+        get_database_path(),
+        max_size=config.get('DB_POOL_SIZE', 8),
+        timeout=config.get('DB_POOL_TIMEOUT', 30.0),
+        pragmas=get_pragmas(),
+    )
+
+def get_writer():
+    """
+    Get the single-writer queue for the configured database.
+    Returns:
+        WriteQueue, or None unless DB_WRITE_MODE is 'queue'
+    """
+    if not has_app_context() or current_app.config.get('DB_WRITE_MODE', 'direct') != 'queue':
+        return None
+    return get_write_queue(
+        get_database_path(),
+        pragmas=get_pragmas(),
+        max_batch=current_app.config.get('DB_WRITE_BATCH_SIZE', 64),
+    )
+
 def get_db():
     """
     Connect to the database.
+    Checks a connection out of the pool once per request.
     Returns a database connection with row factory set to sqlite3.Row.
     """
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        pool = get_connection_pool()
+        db = g._database = pool.acquire()
+        g._database_pool = pool
     return db
 
 def close_db(exception=None):
     """
-    Close the database connection at the end of the request.
+    Return the database connection to the pool at the end of the request.
     """
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    db = g.pop('_database', None)
+    pool = g.pop('_database_pool', None)
+    if db is not None and pool is not None:
+        pool.release(db)
 
 def init_db():
     """
     Initialize the database with schema.
-    Creates tables if they don't exist.
+    Creates the tables of a new database and applies pending migrations to
+    an existing one; data is never dropped.
     """
+    from .migrations import migrate
     with current_app.app_context():
-        db = get_db()
         try:
-            with current_app.open_resource('schema.sql', mode='r') as f:
-                db.cursor().executescript(f.read())
-            db.commit()
+            migrate()
             return True, "Database initialized successfully"
         except sqlite3.Error as e:
             return False, f"Database initialization error: {str(e)}"
@@ -54,6 +119,250 @@ def query_db(query, args=(), one=False):
     cur.close()
     return (rv[0] if rv else None) if one else rv
 
+def iter_query(query, args=(), batch_size=None):
+    """
+    Execute a query and stream the results instead of loading them all.
+    Rows are fetched batch_size at a time with fetchmany, so memory stays
+    flat however many rows match. Consume the generator inside the app
+    context (stream_with_context for streamed responses).
+    Args:
+        query: SQL query to execute
+        args: Parameters for the query
+        batch_size: Rows fetched per batch, defaults to QUERY_BATCH_SIZE
+    Returns:
+        Generator of sqlite3.Row objects
+    """
+    batch_size = batch_size or current_app.config.get('QUERY_BATCH_SIZE', 1000)
+    cur = get_db().execute(query, args)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+def rows_to_dicts(rows):
+    """
+    Convert sqlite3.Row results into plain, mutable dictionaries.
+    Args:
+        rows: Iterable of sqlite3.Row objects
+    Returns:
+        List of dictionaries
+    """
+    return [dict(row) for row in rows]
+
+def attach_related(records, query, foreign_key, attribute, key='id', batch_size=500):
+    """
+    Load the children of many records in batched IN (...) queries and
+    attach them to each record as a list, instead of one query per record.
+    Args:
+        records: List of dictionaries to attach children to
+        query: SQL with a {placeholders} slot for the parent keys, e.g.
+            'SELECT * FROM bookings WHERE guest_id IN ({placeholders})'
+        foreign_key: Column of the child rows holding the parent key
+        attribute: Key under which each record gets its list of children
+        key: Key of the parent records referenced by foreign_key
+        batch_size: Maximum number of parent keys per query
+    Returns:
+        The same records, each with a list (possibly empty) under attribute
+    """
+    children = {}
+    keys = list(dict.fromkeys(record[key] for record in records))
+    for start in range(0, len(keys), batch_size):
+        batch = keys[start:start + batch_size]
+        placeholders = ', '.join(['?'] * len(batch))
+        for row in query_db(query.format(placeholders=placeholders), batch):
+            children.setdefault(row[foreign_key], []).append(dict(row))
+    for record in records:
+        record[attribute] = children.get(record[key], [])
+    return records
+
+class Page(list):
+    """
+    One page of keyset-paginated rows.
+    Behaves like a list of rows; next_cursor is the opaque cursor of the
+    following page, or None on the last page.
+    """
+    next_cursor = None
+
+def encode_cursor(values):
+    """
+    Encode the sort-key values of the last row of a page as an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+    Returns:
+        List of sort-key values
+    Raises:
+        ValueError if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid page cursor: {cursor!r}")
+    return values
+
+def get_page_size(limit):
+    """
+    Clamp a requested page size to the configured bounds.
+    Args:
+        limit: Requested number of rows, or None for the default
+    Returns:
+        Page size between 1 and MAX_PAGE_SIZE
+    """
+    config = current_app.config if has_app_context() else {}
+    if limit is None:
+        limit = config.get('PAGE_SIZE', 50)
+    return max(1, min(int(limit), config.get('MAX_PAGE_SIZE', 500)))
+
+def query_page(query, conditions, params, sort_keys, limit=None, after=None, paginate=True):
+    """
+    Run a list query with keyset (cursor) pagination.
+    Rows after the cursor are found by comparing the sort keys, so every
+    page costs the same no matter how deep it is. The last sort key must
+    be unique (usually the id) to keep the order stable.
+    Args:
+        query: SELECT ... FROM ... without WHERE or ORDER BY
+        conditions: List of WHERE conditions, combined with AND
+        params: Parameters for the conditions
+        sort_keys: List of (SQL expression, result column, 'ASC' or 'DESC')
+        limit: Page size, clamped by get_page_size
+        after: Cursor returned as next_cursor by the previous page; a cursor
+            that does not fit the sort keys restarts from the first page
+        paginate: If False, returns every row as a plain list
+    Returns:
+        Page of rows (or list of rows when paginate is False)
+    """
+    conditions = list(conditions)
+    params = list(params)
+    
+    values = None
+    if paginate and after:
+        try:
+            values = decode_cursor(after)
+        except ValueError:
+            pass
+        # Cursors of another list or hand-edited ones cannot be compared
+        if values is not None and (len(values) != len(sort_keys) or not all(
+            value is None or isinstance(value, (str, int, float)) for value in values
+        )):
+            values = None
+        if values is None:
+            current_app.logger.warning(f"Invalid page cursor: {after!r}")
+    
+    if values is not None:
+        # Sort keys may be NULL, which SQLite orders first ascending and last
+        # descending; IS matches NULL where = and < / > never do
+        alternatives = []
+        for i, (expression, _, direction) in enumerate(sort_keys):
+            value = values[i]
+            if direction == 'DESC':
+                if value is None:
+                    # Nothing sorts after NULL in descending order
+                    continue
+                after_value = f"({expression} < ? OR {expression} IS NULL)"
+            elif value is None:
+                after_value = f"{expression} IS NOT NULL"
+            else:
+                after_value = f"{expression} > ?"
+            parts = [f"{prior} IS ?" for prior, _, _ in sort_keys[:i]]
+            parts.append(after_value)
+            alternatives.append('(' + ' AND '.join(parts) + ')')
+            params.extend(values[:i])
+            if value is not None:
+                params.append(value)
+        conditions.append('(' + ' OR '.join(alternatives or ['0']) + ')')
+    
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY ' + ', '.join(
+        f"{expression} {direction}" for expression, _, direction in sort_keys
+    )
+    
+    if not paginate:
+        return query_db(query, params)
+    
+    limit = get_page_size(limit)
+    rows = query_db(query + ' LIMIT ?', params + [limit + 1])
+    page = Page(rows[:limit])
+    if len(rows) > limit:
+        last = page[-1]
+        page.next_cursor = encode_cursor([last[column] for _, column, _ in sort_keys])
+    return page
+
+_write_listeners = []
+
+def register_write_listener(listener):
+    """
+    Register a callback run after every write made through run_write.
+    Caches use this to drop entries derived from the changed tables.
+    Args:
+        listener: Callable receiving the set of written table names, or
+            None when the tables are not known
+    Returns:
+        The listener, so this can be used as a decorator
+    """
+    _write_listeners.append(listener)
+    return listener
+
+def notify_write(tables=None):
+    """
+    Tell write listeners that tables changed.
+    Args:
+        tables: Iterable of table names, or None if unknown
+    """
+    changed = set(tables) if tables is not None else None
+    for listener in _write_listeners:
+        listener(changed)
+
+def run_write(operation, commit=True, tables=None):
+    """
+    Run a write operation against the database.
+    With DB_WRITE_MODE set to 'queue', committed writes are handed to the
+    writer thread and group-committed with other pending writes. Otherwise,
+    or when the caller manages its own transaction (commit=False or a
+    transaction already open on the request connection), the operation runs
+    on the request connection.
+    Args:
+        operation: Callable receiving a connection and returning a result
+        commit: Whether to commit the transaction
+        tables: Names of the tables written, passed to write listeners
+    Returns:
+        Whatever the operation returned
+    Raises:
+        sqlite3.Error if the commit fails, or whatever the operation raised;
+        the transaction is rolled back in either case
+    """
+    db = get_db()
+    writer = get_writer() if commit and not db.in_transaction else None
+    if writer is not None:
+        result = writer.submit(operation)
+        notify_write(tables)
+        return result
+
+    try:
+        if commit and not db.in_transaction:
+            db.execute('BEGIN IMMEDIATE')
+        result = operation(db)
+        if commit:
+            db.commit()
+    except BaseException:
+        # Whatever failed, never leave a half-done transaction open for the
+        # next write on this connection to commit
+        if commit:
+            db.rollback()
+        raise
+    notify_write(tables)
+    return result
+
 def execute_db(query, args=(), commit=True):
     """
     Execute a query without returning results.
@@ -66,17 +375,22 @@ def execute_db(query, args=(), commit=True):
         True if successful, False otherwise
     """
     try:
-        db = get_db()
-        db.execute(query, args)
-        if commit:
-            db.commit()
+        run_write(lambda conn: conn.execute(query, args), commit)
         return True
     except sqlite3.Error as e:
-        if commit:
-            db.rollback()
         current_app.logger.error(f"Database error: {str(e)}")
         return False
 
+@lru_cache(maxsize=256)
+def _insert_sql(table, columns):
+    placeholders = ', '.join(['?'] * len(columns))
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+@lru_cache(maxsize=256)
+def _update_sql(table, columns, key):
+    set_clause = ', '.join([f"{column} = ?" for column in columns])
+    return f"UPDATE {table} SET {set_clause} WHERE {key} = ?"
+
 def insert_db(table, data, commit=True):
     """
     Insert data into a table.
@@ -88,21 +402,11 @@ def insert_db(table, data, commit=True):
         ID of the inserted row if successful, None otherwise
     """
     try:
-        columns = ', '.join(data.keys())
-        placeholders = ', '.join(['?'] * len(data))
-        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-        
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute(query, list(data.values()))
+        query = _insert_sql(table, tuple(data.keys()))
+        params = list(data.values())
         
-        if commit:
-            db.commit()
-        
-        return cursor.lastrowid
+        return run_write(lambda conn: conn.execute(query, params).lastrowid, commit, [table])
     except sqlite3.Error as e:
-        if commit:
-            db.rollback()
         current_app.logger.error(f"Insert error: {str(e)}")
         return None
 
@@ -124,17 +428,70 @@ def update_db(table, data, condition, condition_params=(), commit=True):
         
         params = list(data.values()) + list(condition_params)
         
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute(query, params)
-        
-        if commit:
-            db.commit()
-        
-        return cursor.rowcount
+        return run_write(lambda conn: conn.execute(query, params).rowcount, commit, [table])
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Update error: {str(e)}")
+        return None
+
+def insert_many(table, rows, commit=True):
+    """
+    Insert many rows into a table with one executemany in one transaction.
+    Args:
+        table: Table name
+        rows: Iterable of dictionaries of column_name: value pairs, all with
+            the columns of the first row
+        commit: Whether to commit the transaction
+    Returns:
+        Number of rows inserted if successful, None otherwise
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    columns = tuple(first.keys())
+    query = _insert_sql(table, columns)
+    # Build every parameter tuple before the transaction opens, so a row
+    # missing a column fails the call without writing anything
+    try:
+        params = [tuple(row[column] for column in columns) for row in chain([first], rows)]
+    except KeyError as e:
+        current_app.logger.error(f"Insert error: row without column {str(e)}")
+        return None
+    
+    try:
+        return run_write(lambda conn: conn.executemany(query, params).rowcount, commit, [table])
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Insert error: {str(e)}")
+        return None
+
+def update_many(table, rows, key='id', commit=True):
+    """
+    Update many rows of a table by key with one executemany in one transaction.
+    Args:
+        table: Table name
+        rows: Iterable of dictionaries holding the key column and the columns
+            to update, all with the columns of the first row
+        key: Column identifying the row to update
+        commit: Whether to commit the transaction
+    Returns:
+        Number of rows affected if successful, None otherwise
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0
+    columns = tuple(column for column in first.keys() if column != key)
+    query = _update_sql(table, columns, key)
+    try:
+        params = [tuple(row[column] for column in columns) + (row[key],)
+                  for row in chain([first], rows)]
+    except KeyError as e:
+        current_app.logger.error(f"Update error: row without column {str(e)}")
+        return None
+    
+    try:
+        return run_write(lambda conn: conn.executemany(query, params).rowcount, commit, [table])
     except sqlite3.Error as e:
-        if commit:
-            db.rollback()
         current_app.logger.error(f"Update error: {str(e)}")
         return None
 
@@ -152,17 +509,8 @@ def delete_db(table, condition, condition_params=(), commit=True):
     try:
         query = f"DELETE FROM {table} WHERE {condition}"
         
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute(query, condition_params)
-        
-        if commit:
-            db.commit()
-        
-        return cursor.rowcount
+        return run_write(lambda conn: conn.execute(query, condition_params).rowcount, commit, [table])
     except sqlite3.Error as e:
-        if commit:
-            db.rollback()
         current_app.logger.error(f"Delete error: {str(e)}")
         return None
 
@@ -172,7 +520,7 @@ def check_db_exists():
     Returns:
         True if database exists, False otherwise
     """
-    return os.path.exists(DATABASE)
+    return os.path.exists(get_database_path())
 
 def create_transaction():
     """
@@ -0,0 +1,43 @@
+import csv
+import io
+import zlib
+
+# Characters of CSV buffered before a chunk is sent
+CHUNK_SIZE = 64 * 1024
+
+def iter_csv(columns, rows, chunk_size=CHUNK_SIZE):
+    """
+    Encode rows as CSV incrementally.
+    Args:
+        columns: Header names; rows are read by these keys
+        rows: Iterable of sqlite3.Row objects or dictionaries
+        chunk_size: Characters buffered before a chunk is yielded
+    Returns:
+        Generator of CSV text chunks, starting with the header
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_gzip(chunks, level=6):
+    """
+    Gzip-compress a stream of text chunks as they are produced.
+    Args:
+        chunks: Iterable of str chunks
+        level: zlib compression level
+    Returns:
+        Generator of compressed byte chunks forming one gzip file
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
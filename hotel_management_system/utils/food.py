@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from datetime import datetime, timedelta
 from functools import wraps
 from . import db, auth
-from .food import (
+from .food_utils import (
     get_all_menu_items, get_menu_item, add_menu_item, update_menu_item, delete_menu_item,
     create_food_order, get_food_order, get_guest_food_orders, get_active_food_orders,
     update_food_order_status, cancel_food_order, get_menu_categories, search_menu,
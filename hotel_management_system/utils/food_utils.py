@@ -0,0 +1,574 @@
+import re
+import sqlite3
+from flask import current_app
+from datetime import datetime
+from . import db, refdata
+
+FOOD_ORDER_STATUSES = ('pending', 'preparing', 'ready', 'delivered', 'cancelled')
+ACTIVE_FOOD_ORDER_STATUSES = ('pending', 'preparing', 'ready')
+# Orders counted in sales, listed so the (status, order_time) index applies
+SOLD_FOOD_ORDER_STATUSES = ('pending', 'preparing', 'ready', 'delivered')
+
+# Dietary filters of the menu page as bits of food_menu.dietary_flags, so
+# any combination of filters is a single integer comparison (the generated
+# column and the food_menu_fts search index are defined in schema.sql)
+DIETARY_FLAGS = {
+    'vegetarian': 1,
+    'vegan': 2,
+    'gluten_free': 4,
+}
+
+# Search rank weights of the name and description columns
+MENU_SEARCH_WEIGHTS = (10.0, 1.0)
+
+# Columns of menu items that can be updated
+MENU_ITEM_COLUMNS = (
+    'name', 'description', 'price', 'category', 'is_vegetarian', 'is_vegan',
+    'is_gluten_free', 'is_special', 'available', 'image_path'
+)
+
+# Tables written when an order is placed
+FOOD_ORDER_TABLES = ('food_orders', 'food_order_items')
+
+def _placeholders(values):
+    return ', '.join('?' for _ in values)
+
+def get_all_menu_items(category=None, available_only=False):
+    """
+    Get the menu, optionally filtered by category. Served from the
+    reference data cache; the returned list must not be modified.
+    
+    Args:
+        category: Category to filter by
+        available_only: Whether to leave out unavailable items
+    
+    Returns:
+        List of menu items ordered by category and name
+    """
+    query = 'SELECT * FROM food_menu'
+    conditions = []
+    params = []
+    
+    if category:
+        conditions.append('category = ?')
+        params.append(category)
+    
+    if available_only:
+        conditions.append('available = 1')
+    
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    
+    query += ' ORDER BY category, name'
+    
+    return refdata.cached('menu', ('items', category, available_only), lambda: db.query_db(query, params))
+
+def get_menu_item(item_id):
+    """
+    Get a menu item by ID.
+    
+    Args:
+        item_id: ID of the menu item
+    
+    Returns:
+        Menu item data or None if not found
+    """
+    return refdata.cached('menu', ('item', int(item_id)), lambda: db.query_db(
+        'SELECT * FROM food_menu WHERE id = ?',
+        [item_id],
+        one=True
+    ))
+
+def get_menu_categories():
+    """
+    Get the menu categories.
+    
+    Returns:
+        List of category names in alphabetical order
+    """
+    return refdata.cached('menu', ('categories',), lambda: [
+        row['category'] for row in db.query_db('SELECT DISTINCT category FROM food_menu ORDER BY category')
+    ])
+
+def get_daily_specials():
+    """
+    Get the available daily specials.
+    
+    Returns:
+        List of menu items marked as special
+    """
+    return refdata.cached('menu', ('specials',), lambda: db.query_db(
+        'SELECT * FROM food_menu WHERE is_special = 1 AND available = 1 ORDER BY category, name'
+    ))
+
+def dietary_mask(dietary_filters):
+    """
+    Combine dietary filters into a dietary_flags bitmask; unknown filters
+    are ignored.
+    """
+    mask = 0
+    for dietary in dietary_filters or []:
+        mask |= DIETARY_FLAGS.get(dietary, 0)
+    return mask
+
+def menu_search_query(text):
+    """
+    Turn search box text into an FTS5 query matching every word as a
+    prefix, so results follow the user's typing.
+    
+    Returns:
+        FTS5 query string, or None if the text has no words
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_menu(query, category=None, dietary_filters=None):
+    """
+    Search available menu items by name and description through the
+    full-text index, in one query.
+    
+    Args:
+        query: Text to search for
+        category: Category to filter by
+        dietary_filters: List of 'vegetarian', 'vegan' and 'gluten_free'
+    
+    Returns:
+        List of matching menu items, best matches first
+    """
+    match = menu_search_query(query)
+    mask = dietary_mask(dietary_filters)
+    conditions = ['m.available = 1']
+    params = []
+    
+    if match:
+        sql = 'SELECT m.* FROM food_menu_fts JOIN food_menu m ON m.id = food_menu_fts.rowid'
+        conditions.insert(0, 'food_menu_fts MATCH ?')
+        params.append(match)
+        order = f'bm25(food_menu_fts, {MENU_SEARCH_WEIGHTS[0]}, {MENU_SEARCH_WEIGHTS[1]}), m.name'
+    else:
+        sql = 'SELECT m.* FROM food_menu m'
+        order = 'm.name'
+    
+    if category:
+        conditions.append('m.category = ?')
+        params.append(category)
+    
+    if mask:
+        conditions.append('(m.dietary_flags & ?) = ?')
+        params.extend([mask, mask])
+    
+    return db.query_db(
+        f"{sql} WHERE {' AND '.join(conditions)} ORDER BY {order}",
+        params
+    )
+
+def add_menu_item(name, description, price, category, is_vegetarian=False, is_vegan=False,
+                  is_gluten_free=False, is_special=False):
+    """
+    Add an item to the menu.
+    
+    Args:
+        name: Name of the dish
+        description: Description
+        price: Price
+        category: Menu category
+        is_vegetarian: Whether the dish is vegetarian
+        is_vegan: Whether the dish is vegan
+        is_gluten_free: Whether the dish is gluten-free
+        is_special: Whether the dish is a daily special
+    
+    Returns:
+        ID of the new menu item if successful, None otherwise
+    """
+    data = {
+        'name': name,
+        'description': description,
+        'price': price,
+        'category': category,
+        'is_vegetarian': 1 if is_vegetarian else 0,
+        'is_vegan': 1 if is_vegan else 0,
+        'is_gluten_free': 1 if is_gluten_free else 0,
+        'is_special': 1 if is_special else 0,
+        'available': 1
+    }
+    
+    item_id = db.insert_db('food_menu', data)
+    if item_id:
+        refdata.invalidate('menu')
+    
+    return item_id
+
+def update_menu_item(item_id, data):
+    """
+    Update a menu item.
+    
+    Args:
+        item_id: ID of the menu item
+        data: Dictionary of fields to update
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    data = {column: value for column, value in data.items() if column in MENU_ITEM_COLUMNS}
+    if not data:
+        return False
+    
+    rows_affected = db.update_db(
+        'food_menu',
+        data,
+        'id = ?',
+        [item_id]
+    )
+    
+    if not rows_affected:
+        return False
+    
+    refdata.invalidate('menu')
+    return True
+
+def delete_menu_item(item_id):
+    """
+    Remove an item from the menu. Items that appear in orders are only
+    marked unavailable, so order history keeps its items.
+    
+    Args:
+        item_id: ID of the menu item
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    def remove(conn):
+        ordered = conn.execute(
+            'SELECT 1 FROM food_order_items WHERE menu_item_id = ? LIMIT 1', [item_id]
+        ).fetchone()
+        if ordered:
+            return conn.execute('UPDATE food_menu SET available = 0 WHERE id = ?', [item_id]).rowcount
+        return conn.execute('DELETE FROM food_menu WHERE id = ?', [item_id]).rowcount
+    
+    try:
+        rows_affected = db.run_write(remove, tables=['food_menu'])
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Delete menu item error: {str(e)}")
+        return False
+    
+    if not rows_affected:
+        return False
+    
+    refdata.invalidate('menu')
+    return True
+
+def create_food_order(guest_id, booking_id, items, is_room_service, table_number=None,
+                      special_requests=None):
+    """
+    Place a food order. Prices of all items are looked up in one query and
+    the order and its items are written in one transaction.
+    
+    Args:
+        guest_id: ID of the guest
+        booking_id: ID of the guest's booking, required for room service
+        items: List of dictionaries with menu_item_id and quantity
+        is_room_service: Whether the order is delivered to the room
+        table_number: Restaurant table for dine-in orders
+        special_requests: Notes for the kitchen
+    
+    Returns:
+        Tuple of (ID of the new order or None, message)
+    """
+    # Merge repeated items so each is priced and stored once
+    quantities = {}
+    try:
+        for item in items:
+            quantity = int(item['quantity'])
+            if quantity > 0:
+                menu_item_id = int(item['menu_item_id'])
+                quantities[menu_item_id] = quantities.get(menu_item_id, 0) + quantity
+    except (KeyError, TypeError, ValueError):
+        return None, "Invalid order items"
+    
+    if not quantities:
+        return None, "The order has no items"
+    
+    if is_room_service and not booking_id:
+        return None, "Room service orders need a booking"
+    
+    def place(conn):
+        if is_room_service:
+            booking = conn.execute(
+                '''
+                SELECT 1 FROM bookings
+                WHERE id = ? AND guest_id = ? AND status IN ('confirmed', 'checked_in')
+                ''',
+                [booking_id, guest_id]
+            ).fetchone()
+            if booking is None:
+                return None, "Room service is only available for your active bookings"
+    
+        menu_item_ids = list(quantities)
+        prices = {
+            row[0]: row[1] for row in conn.execute(
+                f'''
+                SELECT id, price FROM food_menu
+                WHERE id IN ({_placeholders(menu_item_ids)}) AND available = 1
+                ''',
+                menu_item_ids
+            )
+        }
+        if len(prices) != len(menu_item_ids):
+            return None, "Some items are no longer available"
+    
+        total = round(sum(prices[item_id] * quantity for item_id, quantity in quantities.items()), 2)
+        cursor = conn.execute(
+            '''
+            INSERT INTO food_orders (guest_id, booking_id, is_room_service, table_number,
+                                     special_requests, status, total, order_time)
+            VALUES (?, ?, ?, ?, ?, 'pending', ?, ?)
+            ''',
+            [guest_id, booking_id if is_room_service else None, 1 if is_room_service else 0,
+             None if is_room_service else table_number, special_requests, total,
+             datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        )
+        order_id = cursor.lastrowid
+        conn.executemany(
+            'INSERT INTO food_order_items (order_id, menu_item_id, quantity, item_price) VALUES (?, ?, ?, ?)',
+            [(order_id, item_id, quantity, prices[item_id]) for item_id, quantity in quantities.items()]
+        )
+        return order_id, "Order placed successfully"
+    
+    try:
+        return db.run_write(place, tables=FOOD_ORDER_TABLES)
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Food order error: {str(e)}")
+        return None, "Failed to place order"
+
+FOOD_ORDER_QUERY = '''
+    SELECT o.*, g.name as guest_name, r.room_number
+    FROM food_orders o
+    JOIN guests g ON o.guest_id = g.id
+    LEFT JOIN bookings b ON o.booking_id = b.id
+    LEFT JOIN rooms r ON b.room_id = r.id
+'''
+
+def _with_items(orders):
+    """
+    Attach the items of each order, fetched for all orders in one query.
+    
+    Returns:
+        List of order dictionaries with an items list
+    """
+    orders = [dict(order) for order in orders]
+    if not orders:
+        return orders
+    
+    by_id = {order['id']: order for order in orders}
+    for order in orders:
+        order['items'] = []
+    
+    order_ids = list(by_id)
+    items = db.query_db(
+        f'''
+        SELECT oi.order_id, oi.menu_item_id, oi.quantity, oi.item_price, m.name, m.category
+        FROM food_order_items oi
+        JOIN food_menu m ON oi.menu_item_id = m.id
+        WHERE oi.order_id IN ({_placeholders(order_ids)})
+        ORDER BY oi.order_id, oi.id
+        ''',
+        order_ids
+    )
+    for item in items:
+        by_id[item['order_id']]['items'].append(dict(item))
+    
+    return orders
+
+def get_food_order(order_id):
+    """
+    Get a food order with its items.
+    
+    Args:
+        order_id: ID of the order
+    
+    Returns:
+        Order dictionary with an items list, or None if not found
+    """
+    order = db.query_db(FOOD_ORDER_QUERY + ' WHERE o.id = ?', [order_id], one=True)
+    if order is None:
+        return None
+    
+    return _with_items([order])[0]
+
+def get_guest_food_orders(guest_id):
+    """
+    Get all food orders of a guest, most recent first.
+    
+    Args:
+        guest_id: ID of the guest
+    
+    Returns:
+        List of order dictionaries with items
+    """
+    return _with_items(db.query_db(
+        FOOD_ORDER_QUERY + ' WHERE o.guest_id = ? ORDER BY o.order_time DESC',
+        [guest_id]
+    ))
+
+def get_active_food_orders(status=None):
+    """
+    Get the orders the kitchen still has to handle, oldest first.
+    
+    Args:
+        status: Single status to filter by, defaults to all active statuses
+    
+    Returns:
+        List of order dictionaries with items
+    """
+    statuses = [status] if status else list(ACTIVE_FOOD_ORDER_STATUSES)
+    
+    return _with_items(db.query_db(
+        FOOD_ORDER_QUERY + f' WHERE o.status IN ({_placeholders(statuses)}) ORDER BY o.order_time',
+        statuses
+    ))
+
+def update_food_order_status(order_id, status):
+    """
+    Update the status of a food order.
+    
+    Args:
+        order_id: ID of the order
+        status: New status
+    
+    Returns:
+        True if successful, False otherwise
+    """
+    if status not in FOOD_ORDER_STATUSES:
+        return False
+    
+    data = {'status': status}
+    
+    if status == 'delivered':
+        data['delivery_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    rows_affected = db.update_db(
+        'food_orders',
+        data,
+        'id = ?',
+        [order_id]
+    )
+    
+    return rows_affected is not None and rows_affected > 0
+
+def cancel_food_order(order_id, guest_id):
+    """
+    Cancel a guest's food order while the kitchen has not started on it.
+    
+    Args:
+        order_id: ID of the order
+        guest_id: ID of the guest (for verification)
+    
+    Returns:
+        Tuple of (success, message)
+    """
+    rows_affected = db.update_db(
+        'food_orders',
+        {'status': 'cancelled'},
+        "id = ? AND guest_id = ? AND status = 'pending'",
+        [order_id, guest_id]
+    )
+    
+    if rows_affected:
+        return True, "Order cancelled successfully"
+    
+    if rows_affected is None:
+        return False, "Failed to cancel order"
+    
+    order = db.query_db(
+        'SELECT status FROM food_orders WHERE id = ? AND guest_id = ?',
+        [order_id, guest_id],
+        one=True
+    )
+    
+    if not order:
+        return False, "Order not found"
+    
+    return False, f"Cannot cancel an order that is {order['status']}"
+
+def get_food_sales_report(start_date, end_date):
+    """
+    Generate a food sales report. All totals are aggregated in SQL.
+    
+    Args:
+        start_date: Start date (YYYY-MM-DD)
+        end_date: End date (YYYY-MM-DD, inclusive)
+    
+    Returns:
+        Dictionary with the report data
+    """
+    params = {'start_date': start_date, 'end_date': end_date}
+    # Orders placed in the range that were not cancelled
+    orders_in_range = f'''
+        o.status IN ({', '.join(repr(status) for status in SOLD_FOOD_ORDER_STATUSES)})
+        AND o.order_time >= :start_date AND o.order_time < date(:end_date, '+1 day')
+    '''
+    
+    totals = db.query_db(
+        f'''
+        SELECT COUNT(*) as orders,
+               COALESCE(SUM(o.total), 0) as revenue,
+               COALESCE(AVG(o.total), 0) as average_order,
+               COALESCE(SUM(o.is_room_service), 0) as room_service_orders,
+               COALESCE(SUM(CASE WHEN o.is_room_service = 1 THEN o.total ELSE 0 END), 0) as room_service_revenue
+        FROM food_orders o
+        WHERE {orders_in_range}
+        ''',
+        params,
+        one=True
+    )
+    
+    daily_sales = db.query_db(
+        f'''
+        SELECT date(o.order_time) as date, COUNT(*) as orders, SUM(o.total) as revenue
+        FROM food_orders o
+        WHERE {orders_in_range}
+        GROUP BY date(o.order_time)
+        ORDER BY date
+        ''',
+        params
+    )
+    
+    item_sales = db.query_db(
+        f'''
+        SELECT m.id, m.name, m.category,
+               SUM(oi.quantity) as quantity,
+               SUM(oi.quantity * oi.item_price) as revenue
+        FROM food_orders o
+        JOIN food_order_items oi ON oi.order_id = o.id
+        JOIN food_menu m ON oi.menu_item_id = m.id
+        WHERE {orders_in_range}
+        GROUP BY m.id
+        ORDER BY revenue DESC, quantity DESC
+        ''',
+        params
+    )
+    
+    category_sales = {}
+    for item in item_sales:
+        category = category_sales.setdefault(item['category'], {'quantity': 0, 'revenue': 0})
+        category['quantity'] += item['quantity']
+        category['revenue'] += item['revenue']
+    
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'total_orders': totals['orders'],
+        'total_revenue': totals['revenue'],
+        'average_order': totals['average_order'],
+        'room_service_orders': totals['room_service_orders'],
+        'room_service_revenue': totals['room_service_revenue'],
+        'restaurant_orders': totals['orders'] - totals['room_service_orders'],
+        'restaurant_revenue': totals['revenue'] - totals['room_service_revenue'],
+        'daily_sales': [dict(row) for row in daily_sales],
+        'item_sales': [dict(row) for row in item_sales],
+        'top_items': [dict(row) for row in item_sales[:10]],
+        'category_sales': category_sales
+    }
@@ -0,0 +1,57 @@
+from flask import current_app, g
+from . import db, refdata
+from .cache import LRUCache
+
+# User and guest rows by user id, shared by the requests of this worker.
+# Registered with refdata so a profile change in any worker drops it.
+_identities = LRUCache(max_size=1024, ttl=60.0)
+refdata.track('identities', _identities, ttl_key='IDENTITY_CACHE_TTL')
+
+USER_SQL = 'SELECT * FROM users WHERE id = ?'
+GUEST_SQL = 'SELECT * FROM guests WHERE user_id = ?'
+
+def _load(kind, user_id, query):
+    """
+    Look a row up once per request: first on flask.g, then in the worker's
+    LRU cache, and only then in the database.
+    """
+    loaded = g.setdefault('_identities', {})
+    key = (kind, user_id)
+    if key not in loaded:
+        def loader():
+            return db.query_db(query, [user_id], one=True)
+
+        _identities.max_size = current_app.config.get('IDENTITY_CACHE_SIZE', 1024)
+        if _identities.max_size:
+            loaded[key] = refdata.cached('identities', key, loader)
+        else:
+            loaded[key] = loader()
+    return loaded[key]
+
+def load_user(user_id):
+    """
+    Get a user row, fetched at most once per request.
+    Args:
+        user_id: ID of the user
+    Returns:
+        User data or None if not found
+    """
+    return _load('user', user_id, USER_SQL)
+
+def load_guest(user_id):
+    """
+    Get the guest profile of a user, fetched at most once per request.
+    Args:
+        user_id: ID of the user
+    Returns:
+        Guest profile data or None if the user has no profile yet
+    """
+    return _load('guest', user_id, GUEST_SQL)
+
+def invalidate():
+    """
+    Forget loaded users and guest profiles in this request, this worker and,
+    through refdata, every other worker. Call after users or guests changed.
+    """
+    g.pop('_identities', None)
+    refdata.invalidate('identities')
@@ -0,0 +1,329 @@
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime
+from flask import current_app
+from . import db, availability, identity, kpis, refdata, report_cache
+
+ROOM_STATUSES = ('available', 'occupied', 'maintenance')
+BOOKING_STATUSES = ('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled')
+
+def _text(value):
+    value = str(value).strip()
+    if not value:
+        raise ValueError('must not be empty')
+    return value
+
+def _integer(value):
+    return int(value)
+
+def _price(value):
+    value = float(value)
+    if value < 0:
+        raise ValueError('must not be negative')
+    return value
+
+def _date(value):
+    return date.fromisoformat(str(value).strip()[:10]).isoformat()
+
+def _timestamp(value):
+    return str(value).strip()
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _choice(choices):
+    def validate(value):
+        value = str(value).strip()
+        if value not in choices:
+            raise ValueError(f"must be one of {', '.join(choices)}")
+        return value
+    return validate
+
+# Importable tables: column: (validator, required, default), where the
+# default may be a callable producing the value
+IMPORT_TABLES = {
+    'rooms': {
+        'id': (_integer, False, None),
+        'room_number': (_text, True, None),
+        'type': (_text, True, None),
+        'price': (_price, True, None),
+        'capacity': (_integer, True, None),
+        'status': (_choice(ROOM_STATUSES), False, 'available'),
+    },
+    'guests': {
+        'id': (_integer, False, None),
+        'user_id': (_integer, False, None),
+        'name': (_text, True, None),
+        'phone': (_text, True, None),
+        'address': (_text, True, None),
+        'created_at': (_timestamp, False, _now),
+    },
+    'bookings': {
+        'id': (_integer, False, None),
+        'guest_id': (_integer, True, None),
+        'room_id': (_integer, True, None),
+        'check_in': (_date, True, None),
+        'check_out': (_date, True, None),
+        'status': (_choice(BOOKING_STATUSES), True, None),
+        'created_at': (_timestamp, False, _now),
+    },
+}
+
+# Most rejected rows listed in the import result
+MAX_REPORTED_ERRORS = 100
+
+def open_source(path):
+    """
+    Open an import file as text, transparently decompressing .gz files.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode='rt', encoding='utf-8', newline='')
+    return open(path, mode='r', encoding='utf-8', newline='')
+
+def detect_format(path):
+    """
+    Guess the format of an import file from its extension.
+    Returns:
+        'csv', 'jsonl' or 'json'
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.json':
+        return 'json'
+    return 'csv'
+
+def iter_json_array(f, chunk_size=65536):
+    """
+    Parse a JSON array of objects incrementally, one element at a time,
+    without loading the whole document.
+    Args:
+        f: Text file positioned at the array
+        chunk_size: Characters read at a time
+    Returns:
+        Generator of decoded elements
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if not started:
+            if buffer:
+                if buffer[0] != '[':
+                    raise ValueError('JSON import files must hold an array of objects')
+                buffer = buffer[1:]
+                started = True
+                continue
+        elif buffer.startswith(']'):
+            return
+        elif buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # The element continues in the next chunk
+                if eof:
+                    raise
+            else:
+                yield record
+                buffer = buffer[end:]
+                continue
+        if eof:
+            if started:
+                raise ValueError('Unterminated JSON array')
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+def iter_records(f, file_format):
+    """
+    Stream the records of an import file.
+    Args:
+        f: Open text file
+        file_format: 'csv', 'jsonl' or 'json'
+    Returns:
+        Generator of dictionaries
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(f)
+    elif file_format == 'jsonl':
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    elif file_format == 'json':
+        yield from iter_json_array(f)
+    else:
+        raise ValueError(f"Unknown import format: {file_format}")
+
+def validate_record(table, record):
+    """
+    Validate and convert one record against the table's import columns.
+    Empty values count as missing; unknown columns are ignored. Every row
+    holds every import column (None when missing without a default), so
+    the rows of a chunk can be inserted with one statement.
+    Returns:
+        Tuple of (row dictionary, None) or (None, error message)
+    """
+    row = {}
+    for column, (validator, required, default) in IMPORT_TABLES[table].items():
+        value = record.get(column)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if required:
+                return None, f"{column} is required"
+            row[column] = default() if callable(default) else default
+            continue
+        try:
+            row[column] = validator(value)
+        except (TypeError, ValueError) as e:
+            return None, f"{column}: {str(e)}"
+    if table == 'bookings' and row['check_out'] <= row['check_in']:
+        return None, 'check_out must be after check_in'
+    return row, None
+
+def defer_indexes(table):
+    """
+    Drop a table's secondary indexes so a bulk load does not maintain them
+    row by row. Primary keys and UNIQUE constraints stay in place.
+    Returns:
+        List of CREATE INDEX statements to restore them with
+    """
+    indexes = db.query_db(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        [table]
+    )
+
+    def drop(conn):
+        for index in indexes:
+            conn.execute(f'DROP INDEX IF EXISTS {index["name"]}')
+
+    db.run_write(drop, tables=[table])
+    return [index['sql'] for index in indexes]
+
+def restore_indexes(table, statements):
+    """
+    Recreate indexes dropped by defer_indexes, each built in one pass.
+    """
+    def create(conn):
+        for statement in statements:
+            conn.execute(statement)
+
+    db.run_write(create, tables=[table])
+
+def _insert_chunk(table, rows):
+    """
+    Insert a validated chunk in one transaction; if that fails, retry its
+    rows one by one so a single bad row only rejects itself.
+    Returns:
+        Tuple of (number inserted, list of (row, error message))
+    """
+    inserted = db.insert_many(table, rows)
+    if inserted is not None:
+        return inserted, []
+    # Nothing of the failed chunk may reach the commits below
+    conn = db.get_db()
+    if conn.in_transaction:
+        conn.rollback()
+    inserted = 0
+    failures = []
+    for row in rows:
+        if db.insert_db(table, row) is None:
+            failures.append((row, 'rejected by the database'))
+        else:
+            inserted += 1
+    return inserted, failures
+
+def import_file(table, path, file_format=None, batch_size=None, defer_index_maintenance=True,
+                progress=None):
+    """
+    Stream a CSV, JSON Lines or JSON file into rooms, guests or bookings.
+    Records are validated and written in chunks of batch_size, one
+    transaction per chunk. Secondary indexes are dropped for the load and
+    rebuilt afterwards, and booking imports rebuild the room-night calendar
+    and the daily KPI rollup once at the end.
+    Args:
+        table: 'rooms', 'guests' or 'bookings'
+        path: File to import, optionally gzip-compressed (.gz)
+        file_format: 'csv', 'jsonl' or 'json'; guessed from the extension
+        batch_size: Records per chunk, defaults to IMPORT_BATCH_SIZE
+        defer_index_maintenance: Whether to rebuild indexes after the load
+        progress: Optional callable receiving the stats after each chunk
+    Returns:
+        Dictionary of stats: table, read, imported, rejected, seconds,
+        rows_per_second and errors (line, message) for the first rejections
+    """
+    if table not in IMPORT_TABLES:
+        raise ValueError(f"Cannot import into {table}")
+    file_format = file_format or detect_format(path)
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 5000)
+
+    stats = {'table': table, 'read': 0, 'imported': 0, 'rejected': 0,
+             'seconds': 0.0, 'rows_per_second': 0.0, 'errors': []}
+    started = time.perf_counter()
+
+    def reject(line, message):
+        stats['rejected'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append((line, message))
+
+    def flush(chunk, lines):
+        inserted, failures = _insert_chunk(table, chunk)
+        stats['imported'] += inserted
+        failed = {id(row) for row, _ in failures}
+        for row, line in zip(chunk, lines):
+            if id(row) in failed:
+                reject(line, 'rejected by the database')
+        stats['seconds'] = time.perf_counter() - started
+        stats['rows_per_second'] = stats['imported'] / stats['seconds'] if stats['seconds'] else 0.0
+        if progress:
+            progress(stats)
+
+    deferred = defer_indexes(table) if defer_index_maintenance else []
+    try:
+        with open_source(path) as f:
+            chunk = []
+            lines = []
+            # CSV data starts on line 2, after the header
+            first_line = 2 if file_format == 'csv' else 1
+            for number, record in enumerate(iter_records(f, file_format), first_line):
+                stats['read'] += 1
+                if not isinstance(record, dict):
+                    reject(number, 'record is not an object')
+                    continue
+                row, error = validate_record(table, record)
+                if error:
+                    reject(number, error)
+                    continue
+                chunk.append(row)
+                lines.append(number)
+                if len(chunk) >= batch_size:
+                    flush(chunk, lines)
+                    chunk = []
+                    lines = []
+            if chunk:
+                flush(chunk, lines)
+    finally:
+        if deferred:
+            restore_indexes(table, deferred)
+
+    if table == 'bookings' and stats['imported']:
+        availability.rebuild_room_nights()
+        kpis.rebuild_daily_kpis()
+        availability.invalidate()
+        report_cache.invalidate()
+    elif table == 'rooms' and stats['imported']:
+        availability.invalidate()
+        kpis.refresh_available_rooms()
+        report_cache.invalidate()
+        refdata.invalidate('rooms')
+    elif table == 'guests' and stats['imported']:
+        identity.invalidate()
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['imported'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
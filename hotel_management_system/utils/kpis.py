@@ -0,0 +1,233 @@
+import sqlite3
+from array import array
+from datetime import date, datetime
+from flask import current_app
+from . import db, occupancy, report_cache
+from .availability import stay_nights
+
+# Rooms of a type that can be sold, i.e. not out of order
+AVAILABLE_ROOMS_SQL = '''
+    (SELECT COUNT(*) FROM rooms a WHERE a.type = {type_column} AND a.status != 'maintenance')
+'''
+
+def apply_stay(conn, room_id, check_in, check_out, sign=1):
+    """
+    Add (or with sign=-1 remove) a stay's nights to the daily KPI rollup.
+    Must run inside the transaction that creates or cancels the booking.
+    Args:
+        conn: Connection holding the write transaction
+        room_id: ID of the booked room
+        check_in: Check-in date (YYYY-MM-DD)
+        check_out: Check-out date (YYYY-MM-DD)
+        sign: 1 when a booking is created, -1 when it is cancelled
+    """
+    conn.executemany(
+        f'''
+        INSERT INTO daily_kpis (date, room_type, occupied_rooms, room_revenue, available_rooms)
+        SELECT ?, r.type, ?, ? * r.price, {AVAILABLE_ROOMS_SQL.format(type_column='r.type')}
+        FROM rooms r
+        WHERE r.id = ?
+        ON CONFLICT (date, room_type) DO UPDATE SET
+            occupied_rooms = occupied_rooms + excluded.occupied_rooms,
+            room_revenue = room_revenue + excluded.room_revenue
+        ''',
+        [(night, sign, sign, room_id) for night in stay_nights(check_in, check_out)]
+    )
+
+def move_room_stays(conn, room_id, old_type, old_price):
+    """
+    Move a room's booked nights in the rollup from its previous type and
+    price to its current ones, so a later cancellation removes exactly what
+    is counted. Must run inside the transaction that updates the room.
+    Args:
+        conn: Connection holding the write transaction
+        room_id: ID of the updated room
+        old_type: Room type before the update
+        old_price: Room price before the update
+    """
+    nights = [
+        night
+        for stay in conn.execute(
+            '''
+            SELECT check_in, check_out FROM bookings
+            WHERE room_id = ? AND status != 'cancelled' AND check_out > check_in
+            ''',
+            [room_id]
+        )
+        for night in stay_nights(stay['check_in'], stay['check_out'])
+    ]
+    conn.executemany(
+        f'''
+        INSERT INTO daily_kpis (date, room_type, occupied_rooms, room_revenue, available_rooms)
+        VALUES (?, ?, -1, ?, {AVAILABLE_ROOMS_SQL.format(type_column='?')})
+        ON CONFLICT (date, room_type) DO UPDATE SET
+            occupied_rooms = occupied_rooms + excluded.occupied_rooms,
+            room_revenue = room_revenue + excluded.room_revenue
+        ''',
+        [(night, old_type, -old_price, old_type) for night in nights]
+    )
+    conn.executemany(
+        f'''
+        INSERT INTO daily_kpis (date, room_type, occupied_rooms, room_revenue, available_rooms)
+        SELECT ?, r.type, 1, r.price, {AVAILABLE_ROOMS_SQL.format(type_column='r.type')}
+        FROM rooms r
+        WHERE r.id = ?
+        ON CONFLICT (date, room_type) DO UPDATE SET
+            occupied_rooms = occupied_rooms + excluded.occupied_rooms,
+            room_revenue = room_revenue + excluded.room_revenue
+        ''',
+        [(night, room_id) for night in nights]
+    )
+
+def refresh_available_rooms(from_date=None):
+    """
+    Recount sellable rooms per type in the rollup after a room is added or
+    changes type or status. Past days keep the counts they had.
+    Args:
+        from_date: First date to refresh (YYYY-MM-DD), defaults to today
+    Returns:
+        True if successful, False otherwise
+    """
+    from_date = from_date or datetime.now().strftime('%Y-%m-%d')
+    try:
+        db.run_write(lambda conn: conn.execute(
+            f'''
+            UPDATE daily_kpis
+            SET available_rooms = {AVAILABLE_ROOMS_SQL.format(type_column='daily_kpis.room_type')}
+            WHERE date >= ?
+            ''',
+            [from_date]
+        ), tables=['daily_kpis'])
+        return True
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Database error: {str(e)}")
+        return False
+
+def fill_daily_kpis(conn):
+    """
+    Recompute the whole daily KPI rollup from bookings, inside the caller's
+    transaction. Stays are grouped by room type and price and swept once
+    per group.
+    Args:
+        conn: Connection holding the write transaction
+    Returns:
+        Number of rollup rows written
+    """
+    conn.execute('DELETE FROM daily_kpis')
+
+    # Stream the stays into compact per-group day arrays
+    stays = conn.execute(f'''
+        SELECT r.type, r.price,
+               {occupancy.sql_day('b.check_in')} as check_in_day,
+               {occupancy.sql_day('b.check_out')} as check_out_day
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        WHERE b.status != 'cancelled' AND b.check_out > b.check_in
+    ''')
+    groups = {}
+    first_day = last_day = None
+    for stay in stays:
+        check_ins, check_outs = groups.setdefault(
+            (stay['type'], stay['price']), (array('l'), array('l'))
+        )
+        check_ins.append(stay['check_in_day'])
+        check_outs.append(stay['check_out_day'])
+        if first_day is None or stay['check_in_day'] < first_day:
+            first_day = stay['check_in_day']
+        if last_day is None or stay['check_out_day'] - 1 > last_day:
+            last_day = stay['check_out_day'] - 1
+    if not groups:
+        return 0
+
+    labels = occupancy.day_labels(first_day, last_day)
+
+    totals = {}
+    for (room_type, price), (check_ins, check_outs) in groups.items():
+        counts = occupancy.count_occupied(check_ins, check_outs, first_day, last_day)
+        for label, count in zip(labels, counts):
+            if count:
+                occupied, revenue = totals.get((label, room_type), (0, 0.0))
+                totals[(label, room_type)] = (occupied + count, revenue + count * price)
+
+    conn.executemany(
+        f'''
+        INSERT INTO daily_kpis (date, room_type, occupied_rooms, room_revenue, available_rooms)
+        VALUES (?, ?, ?, ?, {AVAILABLE_ROOMS_SQL.format(type_column='?')})
+        ''',
+        [(label, room_type, occupied, revenue, room_type)
+         for (label, room_type), (occupied, revenue) in totals.items()]
+    )
+    return len(totals)
+
+def rebuild_daily_kpis():
+    """
+    Recompute the whole daily KPI rollup from bookings.
+    Returns:
+        Number of rollup rows written
+    """
+    rows = db.run_write(fill_daily_kpis, tables=['daily_kpis'])
+    report_cache.invalidate()
+    return rows
+
+def get_daily_kpis(start_date, end_date, room_type=None):
+    """
+    Read the daily KPI rollup for a date range.
+    Args:
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD, inclusive)
+        room_type: Optional room type filter
+    Returns:
+        Dictionary of date: KPI dictionary (occupied_rooms, available_rooms,
+        room_revenue, adr, revpar) for every date in the range
+    """
+    query = '''
+        SELECT date, room_type, occupied_rooms, room_revenue, available_rooms
+        FROM daily_kpis
+        WHERE date BETWEEN ? AND ?
+    '''
+    params = [start_date, end_date]
+    if room_type:
+        query += ' AND room_type = ?'
+        params.append(room_type)
+    rows = {}
+    for row in db.query_db(query, params):
+        rows.setdefault(row['date'], {})[row['room_type']] = row
+
+    # Types without a rollup row for a day had nothing booked; count their
+    # sellable rooms as they are today
+    count_query = '''
+        SELECT type, COUNT(*) as count FROM rooms
+        WHERE status != 'maintenance'
+    '''
+    count_params = []
+    if room_type:
+        count_query += ' AND type = ?'
+        count_params.append(room_type)
+    count_query += ' GROUP BY type'
+    sellable = {row['type']: row['count'] for row in db.query_db(count_query, count_params)}
+
+    kpis = {}
+    for label in occupancy.day_labels(*occupancy.day_range(start_date, end_date)):
+        day_rows = rows.get(label, {})
+        occupied = sum(row['occupied_rooms'] for row in day_rows.values())
+        revenue = sum(row['room_revenue'] for row in day_rows.values())
+        available = sum(row['available_rooms'] for row in day_rows.values()) + sum(
+            count for kind, count in sellable.items() if kind not in day_rows
+        )
+        kpis[label] = {
+            'occupied_rooms': occupied,
+            'available_rooms': available,
+            'room_revenue': round(revenue, 2),
+            'adr': round(revenue / occupied, 2) if occupied > 0 else 0,
+            'revpar': round(revenue / available, 2) if available > 0 else 0,
+        }
+    return kpis
+
+def get_today_kpis():
+    """
+    Get today's KPIs from the rollup for the admin dashboard.
+    Returns:
+        KPI dictionary for today
+    """
+    today = date.today().isoformat()
+    return get_daily_kpis(today, today)[today]
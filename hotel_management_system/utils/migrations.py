@@ -0,0 +1,237 @@
+import os
+import sqlite3
+from flask import current_app
+from . import db, availability, kpis
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schema.sql')
+
+# Statements of schema.sql, split on first use
+_schema_statements = None
+
+def has_table(conn, table):
+    """
+    Check whether a table exists, using the given connection.
+    """
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [table]
+    ).fetchone() is not None
+
+def has_column(conn, table, column):
+    """
+    Check whether a table has a column, generated columns included.
+    """
+    return any(row[1] == column for row in conn.execute(f'PRAGMA table_xinfo({table})'))
+
+def create_room_nights(conn):
+    """
+    Add the room_nights calendar to databases created before it existed.
+    """
+    if not has_table(conn, 'room_nights'):
+        conn.execute('''
+            CREATE TABLE room_nights (
+                room_id INTEGER NOT NULL,
+                night DATE NOT NULL,
+                booking_id INTEGER NOT NULL,
+                PRIMARY KEY (room_id, night),
+                FOREIGN KEY (room_id) REFERENCES rooms (id),
+                FOREIGN KEY (booking_id) REFERENCES bookings (id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX idx_room_nights_booking ON room_nights (booking_id)')
+        availability.fill_room_nights(conn)
+
+def create_daily_kpis(conn):
+    """
+    Add the daily KPI rollup to databases created before it existed.
+    """
+    if not has_table(conn, 'daily_kpis'):
+        conn.execute('''
+            CREATE TABLE daily_kpis (
+                date DATE NOT NULL,
+                room_type TEXT NOT NULL,
+                occupied_rooms INTEGER NOT NULL DEFAULT 0,
+                room_revenue REAL NOT NULL DEFAULT 0,
+                available_rooms INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, room_type)
+            ) WITHOUT ROWID
+        ''')
+        kpis.fill_daily_kpis(conn)
+
+def add_dietary_flags(conn):
+    """
+    Add the dietary bitmask column to menus created before it existed.
+    """
+    if not has_column(conn, 'food_menu', 'dietary_flags'):
+        conn.execute('''
+            ALTER TABLE food_menu ADD COLUMN dietary_flags INTEGER GENERATED ALWAYS AS (
+                (is_vegetarian != 0) | ((is_vegan != 0) << 1) | ((is_gluten_free != 0) << 2)
+            ) VIRTUAL
+        ''')
+
+# Ordered schema migrations: (version, description, steps), where a step
+# is an SQL statement or a callable receiving the connection.
+# schema.sql always holds the latest schema and sets user_version to the
+# last version below, so only databases created earlier run these.
+# A released migration is history: its DDL is written out here rather
+# than shared with the modules, and is never edited afterwards.
+MIGRATIONS = [
+    (1, 'Indexes for hot query predicates', [
+        'CREATE INDEX IF NOT EXISTS idx_bookings_room_status_dates ON bookings (room_id, status, check_in, check_out)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_status_check_in ON bookings (status, check_in)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings (check_in, check_out)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_guest ON bookings (guest_id, check_in)',
+        'CREATE INDEX IF NOT EXISTS idx_guests_user ON guests (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_guests_name ON guests (name, id)',
+        'CREATE INDEX IF NOT EXISTS idx_employees_name ON employees (name, id)',
+        'CREATE INDEX IF NOT EXISTS idx_employees_department ON employees (department, name, id)',
+        'CREATE INDEX IF NOT EXISTS idx_housekeeping_date_status ON housekeeping (date, status)',
+        'CREATE INDEX IF NOT EXISTS idx_housekeeping_status_date ON housekeeping (status, date)',
+        'CREATE INDEX IF NOT EXISTS idx_housekeeping_employee ON housekeeping (employee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory (item_name, id)',
+        'CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory (category, item_name, id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_status_date ON orders (status, order_date, id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (order_date, id)',
+        'CREATE INDEX IF NOT EXISTS idx_room_service_booking ON room_service (booking_id)',
+        'CREATE INDEX IF NOT EXISTS idx_room_service_status_time ON room_service (status, request_time, id)',
+        'CREATE INDEX IF NOT EXISTS idx_room_service_time ON room_service (request_time, id)',
+        'CREATE INDEX IF NOT EXISTS idx_food_orders_status ON food_orders (status, order_time)',
+        'CREATE INDEX IF NOT EXISTS idx_food_orders_guest ON food_orders (guest_id, order_time)',
+        'CREATE INDEX IF NOT EXISTS idx_food_order_items_order ON food_order_items (order_id)',
+    ]),
+    (2, 'Room-night calendar', [create_room_nights]),
+    (3, 'Daily KPI rollup', [create_daily_kpis]),
+    (4, 'Reference data versions', [
+        '''
+        CREATE TABLE IF NOT EXISTS reference_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+    ]),
+    (5, 'Shared rate limit buckets', [
+        '''
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            full_at REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_rate_limits_full_at ON rate_limits (full_at)',
+    ]),
+    (6, 'Menu full-text search and dietary flags', [
+        add_dietary_flags,
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_menu_fts USING fts5(
+            name, description, content='food_menu', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS food_menu_fts_insert AFTER INSERT ON food_menu BEGIN
+            INSERT INTO food_menu_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS food_menu_fts_delete AFTER DELETE ON food_menu BEGIN
+            INSERT INTO food_menu_fts (food_menu_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS food_menu_fts_update AFTER UPDATE OF name, description ON food_menu BEGIN
+            INSERT INTO food_menu_fts (food_menu_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO food_menu_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+        ''',
+        "INSERT INTO food_menu_fts (food_menu_fts) VALUES ('rebuild')",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def get_schema_version(conn=None):
+    """
+    Get the schema version recorded in the database.
+    Args:
+        conn: Connection to use, defaults to the request connection
+    Returns:
+        Value of PRAGMA user_version
+    """
+    conn = conn or db.get_db()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def schema_statements():
+    """
+    Split schema.sql into statements. The file is read once per process.
+    Returns:
+        List of SQL statements
+    """
+    global _schema_statements
+    if _schema_statements is None:
+        statements = []
+        pending = ''
+        with open(SCHEMA_PATH, mode='r') as f:
+            for line in f:
+                if not pending and (not line.strip() or line.lstrip().startswith('--')):
+                    continue
+                pending += line
+                if sqlite3.complete_statement(pending):
+                    statements.append(pending.strip())
+                    pending = ''
+        _schema_statements = statements
+    return _schema_statements
+
+def is_empty(conn):
+    """
+    Check whether a database has no tables yet.
+    """
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchone() is None
+
+def migrate():
+    """
+    Bring the database schema up to date in a single transaction.
+    An empty database gets schema.sql, which is already at the latest
+    version; otherwise only the migrations newer than PRAGMA user_version
+    run. Up-to-date databases cost one PRAGMA read.
+    Returns:
+        List of applied versions, [LATEST_VERSION] for a new database
+    Raises:
+        sqlite3.Error if a step fails; nothing is applied in that case
+    """
+    if get_schema_version() >= LATEST_VERSION:
+        return []
+
+    def upgrade(conn):
+        # Re-check inside the write lock, another worker may have migrated
+        version = get_schema_version(conn)
+        if version == 0 and is_empty(conn):
+            for statement in schema_statements():
+                conn.execute(statement)
+            return [LATEST_VERSION]
+
+        applied = []
+        for migration_version, description, steps in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            applied.append(migration_version)
+        if applied:
+            conn.execute(f'PRAGMA user_version = {int(applied[-1])}')
+        return applied
+
+    try:
+        applied = db.run_write(upgrade)
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Migration error: {str(e)}")
+        raise
+    if applied:
+        current_app.logger.info(f"Database schema migrated to version {applied[-1]}")
+    return applied
@@ -0,0 +1,142 @@
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python path is used instead
+    np = None
+
+# julianday() of a date minus this offset is its Python date ordinal
+JULIAN_DAY_OFFSET = 1721424.5
+
+def sql_day(column):
+    """
+    SQL expression converting a date column to a Python date ordinal,
+    so dates are parsed by SQLite instead of once per row in Python.
+    Args:
+        column: Column or expression holding a YYYY-MM-DD date
+    Returns:
+        SQL expression string
+    """
+    return f"CAST(julianday({column}) - {JULIAN_DAY_OFFSET} AS INTEGER)"
+
+def day_range(start_date, end_date):
+    """
+    Convert an inclusive YYYY-MM-DD range to day ordinals.
+    Returns:
+        Tuple of (first day, last day)
+    """
+    return date.fromisoformat(start_date).toordinal(), date.fromisoformat(end_date).toordinal()
+
+def day_labels(start_day, end_day):
+    """
+    List the YYYY-MM-DD labels of an inclusive ordinal range.
+    """
+    first = date.fromordinal(start_day)
+    return [(first + timedelta(days=n)).isoformat() for n in range(end_day - start_day + 1)]
+
+def count_occupied(check_ins, check_outs, start_day, end_day, use_numpy=None):
+    """
+    Count occupied rooms per day with a sweep line over stay boundaries.
+
+    Each stay adds +1 at its first night and -1 the day it checks out in a
+    difference array; a prefix sum then yields the per-day counts. Runs in
+    O(stays + days) instead of O(stays x days).
+    Args:
+        check_ins: Sequence of check-in day ordinals
+        check_outs: Sequence of check-out day ordinals (exclusive)
+        start_day: First day of the report (ordinal)
+        end_day: Last day of the report (ordinal, inclusive)
+        use_numpy: Force (True) or disable (False) the NumPy path; by default
+            NumPy is used when installed
+    Returns:
+        List with the number of occupied rooms for each day
+    """
+    days = end_day - start_day + 1
+    if days <= 0:
+        return []
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return _count_occupied_numpy(check_ins, check_outs, start_day, end_day).tolist()
+
+    diff = [0] * (days + 1)
+    stop_day = end_day + 1
+    for check_in, check_out in zip(check_ins, check_outs):
+        lo = check_in if check_in > start_day else start_day
+        hi = check_out if check_out < stop_day else stop_day
+        if lo < hi:
+            diff[lo - start_day] += 1
+            diff[hi - start_day] -= 1
+
+    counts = []
+    running = 0
+    for delta in diff[:days]:
+        running += delta
+        counts.append(running)
+    return counts
+
+def _count_occupied_numpy(check_ins, check_outs, start_day, end_day):
+    days = end_day - start_day + 1
+    lo = np.maximum(np.asarray(check_ins, dtype=np.int64), start_day) - start_day
+    hi = np.minimum(np.asarray(check_outs, dtype=np.int64), end_day + 1) - start_day
+    keep = lo < hi
+    diff = (np.bincount(lo[keep], minlength=days + 1)
+            - np.bincount(hi[keep], minlength=days + 1))
+    return np.cumsum(diff[:days])
+
+def count_nights(check_ins, check_outs, start_day, stop_day, use_numpy=None):
+    """
+    Count the nights of each stay that fall inside a window, arithmetically.
+    Args:
+        check_ins: Sequence of check-in day ordinals
+        check_outs: Sequence of check-out day ordinals (exclusive)
+        start_day: First day of the window (ordinal)
+        stop_day: Day the window stops (ordinal, exclusive)
+        use_numpy: Force (True) or disable (False) the NumPy path
+    Returns:
+        List of night counts, one per stay
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return _count_nights_numpy(check_ins, check_outs, start_day, stop_day).tolist()
+    return [
+        max(0, min(check_out, stop_day) - max(check_in, start_day))
+        for check_in, check_out in zip(check_ins, check_outs)
+    ]
+
+def _count_nights_numpy(check_ins, check_outs, start_day, stop_day):
+    lo = np.maximum(np.asarray(check_ins, dtype=np.int64), start_day)
+    hi = np.minimum(np.asarray(check_outs, dtype=np.int64), stop_day)
+    return np.maximum(hi - lo, 0)
+
+def revenue_by_type(check_ins, check_outs, prices, room_types, start_day, stop_day,
+                    use_numpy=None):
+    """
+    Sum room revenue per room type for the nights inside a window.
+    Args:
+        check_ins: Sequence of check-in day ordinals
+        check_outs: Sequence of check-out day ordinals (exclusive)
+        prices: Sequence of nightly prices
+        room_types: Sequence of room type names
+        start_day: First day of the window (ordinal)
+        stop_day: Day the window stops (ordinal, exclusive)
+        use_numpy: Force (True) or disable (False) the NumPy path
+    Returns:
+        Tuple of (list of per-stay revenue, dictionary of room type: revenue)
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy and len(prices):
+        nights = _count_nights_numpy(check_ins, check_outs, start_day, stop_day)
+        revenue = nights * np.asarray(prices, dtype=np.float64)
+        kinds, codes = np.unique(np.asarray(room_types, dtype=object), return_inverse=True)
+        totals = np.bincount(codes, weights=revenue, minlength=len(kinds))
+        return revenue.tolist(), {kind: float(total) for kind, total in zip(kinds, totals)}
+
+    nights = count_nights(check_ins, check_outs, start_day, stop_day, use_numpy=False)
+    revenue = [count * price for count, price in zip(nights, prices)]
+    totals = {}
+    for kind, amount in zip(room_types, revenue):
+        totals[kind] = totals.get(kind, 0) + amount
+    return revenue, totals
@@ -0,0 +1,139 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+
+# Default scrypt cost: N=2**14, r=8 takes about 16 MB and tens of ms per hash
+DEFAULT_COST = {'n': 2 ** 14, 'r': 8, 'p': 1}
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Hashes written before the KDF: unsalted hex SHA-256
+LEGACY_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+# Hashes of a random password per cost, verified against when a login names
+# no user so the response takes as long as for a wrong password
+_dummy_hashes = {}
+
+def get_cost():
+    """
+    Get the configured scrypt cost.
+    Returns:
+        Dictionary of n, r and p
+    """
+    config = current_app.config if has_app_context() else {}
+    return {
+        'n': config.get('PASSWORD_HASH_N', DEFAULT_COST['n']),
+        'r': config.get('PASSWORD_HASH_R', DEFAULT_COST['r']),
+        'p': config.get('PASSWORD_HASH_P', DEFAULT_COST['p']),
+    }
+
+def get_executor():
+    """
+    Get the thread pool hashes run on. hashlib.scrypt releases the GIL, so
+    the pool hashes in parallel while bounding the CPU time and memory spent
+    on concurrent logins to PASSWORD_HASH_WORKERS hashes at a time.
+    """
+    global _executor, _executor_pid
+    with _executor_lock:
+        # A forked worker inherits the pool object but not its threads
+        if _executor_pid != os.getpid():
+            _executor = None
+            _executor_pid = os.getpid()
+        if _executor is None:
+            config = current_app.config if has_app_context() else {}
+            workers = config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        return _executor
+
+def shutdown_executor():
+    """
+    Stop the hashing threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+def derive_key(password, salt, n, r, p):
+    """
+    Run scrypt on the calling thread.
+    Returns:
+        Derived key bytes
+    """
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=KEY_BYTES
+    )
+
+def _derive(password, salt, cost):
+    return get_executor().submit(derive_key, password, salt, cost['n'], cost['r'], cost['p']).result()
+
+def _encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+def hash_password(password):
+    """
+    Hash a password for storing, on the hashing pool.
+    Returns:
+        String of the form scrypt$n$r$p$salt$key
+    """
+    cost = get_cost()
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(password, salt, cost)
+    return f"scrypt${cost['n']}${cost['r']}${cost['p']}${_encode(salt)}${_encode(key)}"
+
+def dummy_hash():
+    """
+    Get a hash of a random password at the configured cost, computed once
+    per process and cost.
+    Returns:
+        String of the form scrypt$n$r$p$salt$key
+    """
+    cost = tuple(get_cost().values())
+    if cost not in _dummy_hashes:
+        _dummy_hashes[cost] = hash_password(_encode(os.urandom(KEY_BYTES)))
+    return _dummy_hashes[cost]
+
+def _parse(stored_password):
+    try:
+        scheme, n, r, p, salt, key = stored_password.split('$')
+        if scheme != 'scrypt':
+            return None
+        return {'n': int(n), 'r': int(r), 'p': int(p)}, base64.b64decode(salt), base64.b64decode(key)
+    except (AttributeError, ValueError):
+        return None
+
+def verify_password(stored_password, provided_password):
+    """
+    Check a password against a stored scrypt or legacy SHA-256 hash,
+    in constant time.
+    Returns:
+        True if the password matches
+    """
+    if stored_password and LEGACY_HASH.match(stored_password):
+        legacy = hashlib.sha256(provided_password.encode()).hexdigest()
+        return hmac.compare_digest(stored_password, legacy)
+    parsed = _parse(stored_password)
+    if parsed is None:
+        return False
+    cost, salt, key = parsed
+    return hmac.compare_digest(key, _derive(provided_password, salt, cost))
+
+def needs_rehash(stored_password):
+    """
+    Check whether a stored hash is legacy SHA-256 or uses another cost than
+    the configured one, so it should be replaced after a successful login.
+    """
+    parsed = _parse(stored_password)
+    return parsed is None or parsed[0] != get_cost()
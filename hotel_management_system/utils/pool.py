@@ -0,0 +1,218 @@
+import os
+import sqlite3
+import threading
+import time
+
+# PRAGMAs applied once when a pooled connection is opened
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'cache_size': -8000,
+    'temp_store': 'MEMORY',
+}
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by every thread of a process.
+
+    A thread that already holds a connection gets the same one back from
+    acquire(), so nested helpers never check out a second connection.
+    Idle connections are health-checked before being handed out again.
+    """
+
+    def __init__(self, database, max_size=8, timeout=30.0, pragmas=None,
+                 health_check_interval=30.0):
+        """
+        Args:
+            database: Path to the SQLite database file
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection
+            pragmas: Dictionary of PRAGMA name: value pairs, merged over the defaults
+            health_check_interval: Idle seconds after which a connection is pinged
+        """
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.health_check_interval = health_check_interval
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """
+        Check out a connection for the current thread.
+        Returns:
+            sqlite3.Connection with row factory set to sqlite3.Row
+        Raises:
+            PoolTimeout if the pool stays exhausted for longer than the timeout
+        """
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        conn = None
+        last_used = None
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.OperationalError('Connection pool is closed')
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s"
+                    )
+                self._cond.wait(remaining)
+
+        if conn is not None and time.monotonic() - last_used > self.health_check_interval:
+            if not self._is_healthy(conn):
+                self._close_quietly(conn)
+                conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """
+        Return a connection checked out with acquire().
+        Any transaction left open by the caller is rolled back.
+        Args:
+            conn: Connection to return
+        """
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.depth -= 1
+            if self._local.depth > 0:
+                return
+            self._local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        """
+        Close a broken connection instead of returning it to the pool.
+        Args:
+            conn: Connection to drop
+        """
+        if getattr(self._local, 'conn', None) is conn:
+            self._local.conn = None
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def close(self):
+        """
+        Close all idle connections and refuse further checkouts.
+        Connections still in use are closed when they are released.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Get pool usage counters.
+        Returns:
+            Dictionary with open, idle and in-use connection counts
+        """
+        with self._cond:
+            return {
+                'open': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+def get_pool(database, **options):
+    """
+    Get the process-wide pool for a database, creating it on first use.
+    Pools are rebuilt after a fork so workers never share connections.
+    Args:
+        database: Path to the SQLite database file
+        options: Keyword arguments passed to ConnectionPool on creation
+    Returns:
+        ConnectionPool for the database
+    """
+    global _pools_pid
+    key = os.path.abspath(database) if database != ':memory:' else database
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(database, **options)
+        return pool
+
+def close_all_pools():
+    """
+    Close every pool created in this process.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
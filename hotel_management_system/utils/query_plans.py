@@ -0,0 +1,140 @@
+import inspect
+import re
+from datetime import date, timedelta
+from flask import current_app
+from . import db, availability, admin_utils, food_utils, report_cache, user_utils
+
+# Modules whose read functions carry the hot queries
+AUDITED_MODULES = (admin_utils, user_utils, food_utils)
+AUDITED_PREFIXES = ('get_', 'generate_', 'search_', 'calculate_')
+
+# Small reference tables that may be read in full
+SCAN_ALLOWED = {'rooms', 'food_menu'}
+
+TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+SQL_KEYWORDS = {'where', 'on', 'join', 'left', 'inner', 'outer', 'cross', 'group', 'order',
+                'limit', 'using', 'natural', 'union', 'as'}
+
+def sample_arguments():
+    """
+    Sample values for the parameters of the audited functions, by name.
+    """
+    today = date.today()
+    return {
+        'user_id': 1,
+        'guest_id': 1,
+        'booking_id': 1,
+        'room_id': 1,
+        'order_id': 1,
+        'item_id': 1,
+        'query': 'chicken',
+        'check_in': today.isoformat(),
+        'check_out': (today + timedelta(days=3)).isoformat(),
+        'start_date': (today - timedelta(days=30)).isoformat(),
+        'end_date': today.isoformat(),
+        'status': 'pending',
+        'date': today.isoformat(),
+        'filter_department': 'Housekeeping',
+        'filter_status': 'available',
+        'filter_type': 'Standard',
+        'category': 'Food',
+        'room_type': 'Standard',
+        'with_bookings': True,
+        'include_cancelled': True,
+    }
+
+def table_aliases(sql):
+    """
+    Map the table names and aliases in a statement to table names.
+    """
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+def full_scans(conn, sql):
+    """
+    Find the full table scans in a statement's query plan.
+    Args:
+        conn: Database connection
+        sql: Statement with its parameters already bound
+    Returns:
+        List of (table, plan detail) tuples
+    """
+    aliases = table_aliases(sql)
+    scans = []
+    for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}'):
+        detail = row[3]
+        match = re.match(r'SCAN (\w+)', detail)
+        if not match or 'USING' in detail or detail.startswith('SCAN CONSTANT ROW'):
+            continue
+        if re.search(r'VIRTUAL TABLE INDEX \d+:\S', detail):
+            # A virtual table (e.g. FTS5) answering a constraint such as MATCH
+            continue
+        table = aliases.get(match.group(1).lower(), match.group(1).lower())
+        if table not in SCAN_ALLOWED:
+            scans.append((table, detail))
+    return scans
+
+def audited_calls():
+    """
+    List the read functions to audit with the argument sets to call them
+    with: only the required arguments, then every argument with a sample.
+    Returns:
+        List of (label, function, kwargs) tuples
+    """
+    samples = sample_arguments()
+    calls = []
+    for module in AUDITED_MODULES:
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if function.__module__ != module.__name__ or not name.startswith(AUDITED_PREFIXES):
+                continue
+            parameters = inspect.signature(function).parameters.values()
+            required = [p.name for p in parameters if p.default is inspect.Parameter.empty]
+            if any(p not in samples for p in required):
+                continue
+            label = f"{module.__name__.rsplit('.', 1)[-1]}.{name}"
+            calls.append((label, function, {p: samples[p] for p in required}))
+            optional = {p.name: samples[p.name] for p in parameters
+                        if p.default is not inspect.Parameter.empty and p.name in samples}
+            if optional:
+                calls.append((label, function, {**{p: samples[p] for p in required}, **optional}))
+    return calls
+
+def audit_query_plans():
+    """
+    Run every audited read function, capture the statements it executes
+    and check their query plans for full table scans.
+    Returns:
+        Tuple of (number of statements checked, list of failures), where
+        each failure is a dictionary with function, sql, table and detail
+    """
+    conn = db.get_db()
+    checked = 0
+    failures = []
+    for label, function, kwargs in audited_calls():
+        # Cached reads would hide their queries
+        admin_utils._dashboard_cache.invalidate()
+        availability.invalidate()
+        report_cache.invalidate()
+
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            function(**kwargs)
+        except Exception as e:
+            # The statements run before the failure are still audited
+            current_app.logger.error(f"Query audit of {label} error: {str(e)}")
+        finally:
+            conn.set_trace_callback(None)
+
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            checked += 1
+            for table, detail in full_scans(conn, sql):
+                failures.append({'function': label, 'sql': ' '.join(sql.split()),
+                                 'table': table, 'detail': detail})
+    return checked, failures
@@ -0,0 +1,267 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, request, session
+from . import db
+
+# Default limits per scope: (tokens refilled per second, bucket size)
+DEFAULT_LIMITS = {
+    'login': (10 / 60.0, 10),
+    'register': (5 / 3600.0, 5),
+    'booking': (20 / 3600.0, 10),
+}
+
+# Shared buckets are pruned once every this many checks per process
+PRUNE_INTERVAL = 256
+
+def refill(tokens, updated, now, rate, burst):
+    """
+    Get the tokens in a bucket after refilling it since it was last updated.
+    """
+    return min(burst, tokens + (now - updated) * rate)
+
+def take(tokens, rate):
+    """
+    Take one token from a bucket.
+    Returns:
+        Tuple of (allowed, tokens left, seconds until a token is available)
+    """
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+class TokenBuckets:
+    """
+    Thread-safe token buckets for this process. Each check is O(1); at most
+    max_keys buckets are kept, forgetting the least recently used first.
+    """
+
+    def __init__(self, max_keys=50000):
+        """
+        Args:
+            max_keys: Maximum number of buckets kept
+        """
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, now=None):
+        """
+        Take a token from a bucket, which starts full.
+        Args:
+            key: Bucket key
+            rate: Tokens refilled per second
+            burst: Bucket size
+            now: Current time, defaults to time.time()
+        Returns:
+            Tuple of (allowed, seconds until a token is available)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._buckets.get(key)
+            tokens = burst if entry is None else refill(entry[0], entry[1], now, rate, burst)
+            allowed, tokens, retry_after = take(tokens, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def peek(self, key, rate, burst, now=None):
+        """
+        Check whether a bucket has a token without taking it.
+        Returns:
+            Tuple of (allowed, seconds until a token is available)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._buckets.get(key)
+        tokens = burst if entry is None else refill(entry[0], entry[1], now, rate, burst)
+        if tokens >= 1:
+            return True, 0.0
+        return False, (1 - tokens) / rate
+
+    def reset(self):
+        """
+        Forget every bucket.
+        """
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+_local_buckets = TokenBuckets()
+_checks = 0
+_checks_lock = threading.Lock()
+
+def consume_shared(key, rate, burst, now=None):
+    """
+    Take a token from a bucket stored in the rate_limits table, so every
+    worker process shares it. Rows of buckets that have refilled completely
+    are equivalent to missing ones and are pruned periodically.
+    Returns:
+        Tuple of (allowed, seconds until a token is available)
+    """
+    global _checks
+    now = time.time() if now is None else now
+    with _checks_lock:
+        _checks += 1
+        prune = _checks % PRUNE_INTERVAL == 0
+
+    def update(conn):
+        row = conn.execute('SELECT tokens, updated FROM rate_limits WHERE key = ?', [key]).fetchone()
+        tokens = burst if row is None else refill(row[0], row[1], now, rate, burst)
+        allowed, tokens, retry_after = take(tokens, rate)
+        conn.execute(
+            '''
+            INSERT INTO rate_limits (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at
+            ''',
+            [key, tokens, now, now + (burst - tokens) / rate]
+        )
+        if prune:
+            conn.execute('DELETE FROM rate_limits WHERE full_at < ?', [now])
+        return allowed, retry_after
+
+    return db.run_write(update, tables=['rate_limits'])
+
+def peek_shared(key, rate, burst, now=None):
+    """
+    Check whether a bucket in the rate_limits table has a token without
+    taking it.
+    Returns:
+        Tuple of (allowed, seconds until a token is available)
+    """
+    now = time.time() if now is None else now
+    row = db.query_db('SELECT tokens, updated FROM rate_limits WHERE key = ?', [key], one=True)
+    tokens = burst if row is None else refill(row['tokens'], row['updated'], now, rate, burst)
+    if tokens >= 1:
+        return True, 0.0
+    return False, (1 - tokens) / rate
+
+def get_limit(scope):
+    """
+    Get the limit of a scope, from RATE_LIMITS or the defaults.
+    Returns:
+        Tuple of (tokens refilled per second, bucket size)
+    """
+    limits = current_app.config.get('RATE_LIMITS') or {}
+    return limits.get(scope, DEFAULT_LIMITS[scope])
+
+def _use_bucket(key, rate, burst, peek=False):
+    shared = current_app.config.get('RATE_LIMIT_STORAGE', 'memory') == 'sqlite'
+    if shared:
+        try:
+            return (peek_shared if peek else consume_shared)(key, rate, burst)
+        except sqlite3.Error as e:
+            current_app.logger.error(f"Rate limit error: {str(e)}")
+    else:
+        _local_buckets.max_keys = current_app.config.get('RATE_LIMIT_MAX_KEYS', 50000)
+    return (_local_buckets.peek if peek else _local_buckets.consume)(key, rate, burst)
+
+def check(scope, keys, peek_keys=()):
+    """
+    Take a token from the scope's bucket of every key.
+    Args:
+        scope: Limit scope, e.g. 'login'
+        keys: Bucket keys within the scope, e.g. the client address
+        peek_keys: Bucket keys that must hold a token but are not drawn
+            from here, e.g. a username charged by record_failure
+    Returns:
+        Seconds to wait if any bucket is empty, otherwise 0
+    """
+    rate, burst = get_limit(scope)
+    for key in keys:
+        allowed, retry_after = _use_bucket(f'{scope}:{key}', rate, burst)
+        if not allowed:
+            return retry_after
+    for key in peek_keys:
+        allowed, retry_after = _use_bucket(f'{scope}:{key}', rate, burst, peek=True)
+        if not allowed:
+            return retry_after
+    return 0
+
+def record_failure(scope, username):
+    """
+    Take a token from a username's bucket after a failed attempt, for
+    routes limited with username_failures_only.
+    Args:
+        scope: Limit scope, e.g. 'login'
+        username: Submitted username
+    """
+    if username and current_app.config.get('RATE_LIMIT_ENABLED', True):
+        rate, burst = get_limit(scope)
+        _use_bucket(f'{scope}:{username_key(username)}', rate, burst)
+
+def client_address():
+    """
+    Get the client address. Behind reverse proxies REMOTE_ADDR is the
+    nearest proxy, which would put every client in one bucket; set
+    RATE_LIMIT_TRUSTED_PROXIES to the number of proxies in front of the app
+    to use the address the outermost one appended to X-Forwarded-For. Keep
+    it 0 when clients connect directly, since they can forge the header.
+    """
+    hops = current_app.config.get('RATE_LIMIT_TRUSTED_PROXIES', 0)
+    if hops:
+        forwarded = [address.strip() for address in request.headers.get('X-Forwarded-For', '').split(',')
+                     if address.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr
+
+def username_key(username):
+    """
+    Get the bucket key of a submitted username.
+    """
+    return f'username:{username.strip().lower()}'
+
+def request_keys(username_field='username'):
+    """
+    Get the bucket keys of the current request: the client address, the
+    submitted username and the logged-in user.
+    """
+    keys = [f'ip:{client_address()}']
+    username = request.form.get(username_field) if username_field else None
+    if username:
+        keys.append(username_key(username))
+    if 'user_id' in session:
+        keys.append(f"user:{session['user_id']}")
+    return keys
+
+def rate_limited(scope, methods=('POST',), username_field='username', username_failures_only=False):
+    """
+    Decorator to throttle a route with token buckets per client address,
+    submitted username and logged-in user. Requests over the limit get a
+    429 response with a Retry-After header.
+    Args:
+        scope: Limit scope in RATE_LIMITS ('login', 'register' or 'booking')
+        methods: HTTP methods counted against the limit
+        username_field: Form field holding the username, or None
+        username_failures_only: If True, the username's bucket is only drawn
+            from by record_failure, so requests from other addresses cannot
+            lock a user out who keeps logging in successfully
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method in methods and current_app.config.get('RATE_LIMIT_ENABLED', True):
+                if username_failures_only:
+                    username = request.form.get(username_field) if username_field else None
+                    retry_after = check(scope, request_keys(None),
+                                        [username_key(username)] if username else ())
+                else:
+                    retry_after = check(scope, request_keys(username_field))
+                if retry_after:
+                    seconds = max(1, int(retry_after + 0.999))
+                    return Response(
+                        f'Too many attempts, please try again in {seconds} seconds.\n',
+                        status=429, mimetype='text/plain',
+                        headers={'Retry-After': str(seconds)}
+                    )
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
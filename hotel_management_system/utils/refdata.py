@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+from flask import current_app, has_app_context
+from . import db
+from .cache import TTLCache
+
+# Reference data sets cached per process, each with a version row in the
+# reference_versions table
+REFERENCE_SETS = ('rooms', 'employees', 'menu')
+
+_caches = {name: TTLCache(ttl=60.0) for name in REFERENCE_SETS}
+# Config keys of the TTLs of tracked sets, REFERENCE_CACHE_TTL otherwise
+_ttl_keys = {}
+
+class _VersionWatcher:
+    """
+    Notices reference data changed by other connections and processes.
+
+    A private connection reads PRAGMA data_version, which changes whenever
+    another connection commits to the database. Only then is the small
+    reference_versions table read to find which sets changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self._database = None
+        self._pid = None
+        self._data_version = None
+        self._versions = {}
+
+    def _connect(self, database):
+        if self._conn is not None and self._database == database and self._pid == os.getpid():
+            return
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._database = database
+        self._pid = os.getpid()
+        self._data_version = None
+        self._versions = {}
+
+    def changed_sets(self, database):
+        """
+        Get the reference sets changed since the previous check.
+        Returns:
+            Set of names; every set on the first check
+        """
+        with self._lock:
+            try:
+                self._connect(database)
+                data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+                if data_version == self._data_version:
+                    return set()
+                self._data_version = data_version
+                versions = dict(self._conn.execute('SELECT name, version FROM reference_versions'))
+            except sqlite3.Error:
+                # No versions table yet: fall back to the TTL alone
+                return set()
+            changed = {name for name in _caches
+                       if versions.get(name, 0) != self._versions.get(name)}
+            self._versions = versions
+            return changed
+
+_watcher = _VersionWatcher()
+
+def _sync():
+    for name in _watcher.changed_sets(db.get_database_path()):
+        _caches[name].invalidate()
+
+def track(name, cache, ttl_key='REFERENCE_CACHE_TTL'):
+    """
+    Register another per-process cache as a reference set, so invalidate()
+    and changes made by other workers drop it like the built-in sets.
+    Args:
+        name: Name of the set in reference_versions
+        cache: Cache with get_or_load() and invalidate(), e.g. an LRUCache
+        ttl_key: Config key holding the set's maximum entry age in seconds
+    """
+    _caches[name] = cache
+    _ttl_keys[name] = ttl_key
+
+def cached(name, key, loader):
+    """
+    Get reference data from the per-process cache, loading it on a miss.
+    Entries live REFERENCE_CACHE_TTL seconds at most (or the TTL key the
+    set was tracked with) and are dropped as soon as any worker
+    invalidates their set.
+    Cached values are shared between requests and must not be modified.
+    Args:
+        name: Reference set ('rooms', 'employees', 'menu' or a tracked set)
+        key: Hashable key within the set, e.g. the query's filters
+        loader: Callable loading the data
+    Returns:
+        The cached or freshly loaded data
+    """
+    cache = _caches[name]
+    if has_app_context():
+        cache.ttl = current_app.config.get(_ttl_keys.get(name, 'REFERENCE_CACHE_TTL'), 60.0)
+        if not cache.ttl:
+            return loader()
+    _sync()
+    return cache.get_or_load(key, loader)
+
+def invalidate(name):
+    """
+    Drop a reference set in this process and bump its version so other
+    workers drop it on their next read. Call after the set's data changed.
+    Args:
+        name: Reference set ('rooms', 'employees', 'menu' or a tracked set)
+    """
+    _caches[name].invalidate()
+    # Name the table so caches keyed on other tables (reports) are kept
+    try:
+        db.run_write(lambda conn: conn.execute(
+            '''
+            INSERT INTO reference_versions (name, version) VALUES (?, 1)
+            ON CONFLICT (name) DO UPDATE SET version = version + 1
+            ''',
+            [name]
+        ), tables=['reference_versions'])
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Database error: {str(e)}")
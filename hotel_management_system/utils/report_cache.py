@@ -0,0 +1,55 @@
+from flask import current_app, has_app_context
+from . import db
+from .cache import LRUCache
+
+# Report results keyed by (report type, start date, end date, options)
+_report_cache = LRUCache(max_size=128, ttl=300.0)
+
+@db.register_write_listener
+def _invalidate_unknown_writes(tables):
+    # Writes that do not name their tables (e.g. migrations) may touch anything
+    if tables is None:
+        _report_cache.invalidate()
+
+def get_or_load(report_type, start_date, end_date, options, loader):
+    """
+    Get a cached report, generating it on a miss.
+    Cached reports are shared between callers and must not be modified.
+    Args:
+        report_type: Name of the report, e.g. 'occupancy'
+        start_date: First date of the report (YYYY-MM-DD)
+        end_date: Last date of the report (YYYY-MM-DD)
+        options: Hashable tuple of the other report arguments
+        loader: Callable generating the report
+    Returns:
+        The report
+    """
+    if has_app_context():
+        _report_cache.max_size = current_app.config.get('REPORT_CACHE_SIZE', 128)
+        _report_cache.ttl = current_app.config.get('REPORT_CACHE_TTL', 300.0)
+    if not _report_cache.max_size:
+        return loader()
+    return _report_cache.get_or_load((report_type, start_date, end_date, options), loader)
+
+def invalidate_range(start_date, end_date):
+    """
+    Drop the cached reports whose range overlaps a changed stay, after a
+    booking is created, cancelled or changes status.
+    Args:
+        start_date: Check-in date of the stay (YYYY-MM-DD)
+        end_date: Check-out date of the stay (YYYY-MM-DD)
+    Returns:
+        Number of reports dropped
+    """
+    start_date = str(start_date)[:10]
+    end_date = str(end_date)[:10]
+    # Reports list bookings touching their range, so boundaries count
+    return _report_cache.invalidate_where(
+        lambda key: key[1] <= end_date and key[2] >= start_date
+    )
+
+def invalidate():
+    """
+    Drop every cached report, e.g. after rooms or prices change.
+    """
+    _report_cache.invalidate()
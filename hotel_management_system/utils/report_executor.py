@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from flask import current_app, has_app_context
+from . import db, occupancy
+
+# Process pools by worker count, created on first use
+_executors = {}
+_executors_lock = threading.Lock()
+
+STAYS_SQL = f'''
+    SELECT r.type, r.price,
+           {occupancy.sql_day('b.check_in')} as check_in_day,
+           {occupancy.sql_day('b.check_out')} as check_out_day
+    FROM bookings b
+    JOIN rooms r ON b.room_id = r.id
+    WHERE b.check_in <= ? AND b.check_out >= ?
+    AND b.status != 'cancelled'
+'''
+
+def _connect_read_only(database):
+    conn = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    conn.execute('PRAGMA query_only = ON')
+    return conn
+
+def _read_stays(database, start_day, stop_day):
+    conn = _connect_read_only(database)
+    try:
+        return conn.execute(STAYS_SQL, [
+            date.fromordinal(stop_day).isoformat(),
+            date.fromordinal(start_day).isoformat(),
+        ]).fetchall()
+    finally:
+        conn.close()
+
+def occupancy_partition(database, start_day, end_day):
+    """
+    Count occupied rooms per day for one slice of a report range.
+    Runs in a worker process with its own read-only connection.
+    Args:
+        database: Path of the database
+        start_day: First day of the slice (ordinal)
+        end_day: Last day of the slice (ordinal, inclusive)
+    Returns:
+        List of occupied room counts, one per day
+    """
+    stays = _read_stays(database, start_day, end_day + 1)
+    return occupancy.count_occupied(
+        [stay[2] for stay in stays], [stay[3] for stay in stays], start_day, end_day
+    )
+
+def revenue_partition(database, start_day, stop_day):
+    """
+    Sum revenue per room type for the nights in one slice of a report range.
+    Runs in a worker process with its own read-only connection.
+    Args:
+        database: Path of the database
+        start_day: First day of the slice (ordinal)
+        stop_day: Day the slice stops (ordinal, exclusive)
+    Returns:
+        Dictionary of room type: revenue
+    """
+    stays = _read_stays(database, start_day, stop_day)
+    _, totals = occupancy.revenue_by_type(
+        [stay[2] for stay in stays], [stay[3] for stay in stays],
+        [stay[1] for stay in stays], [stay[0] for stay in stays],
+        start_day, stop_day
+    )
+    return {kind: float(total) for kind, total in totals.items()}
+
+def get_executor(workers):
+    """
+    Get the shared process pool with the given number of workers.
+    Workers are spawned rather than forked so they never inherit the
+    parent's connections, pool or writer threads.
+    """
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return executor
+
+def shutdown_executors():
+    """
+    Stop the report worker processes.
+    """
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True)
+        _executors.clear()
+
+def split_days(start_day, stop_day, parts):
+    """
+    Split the ordinal range [start_day, stop_day) into contiguous slices.
+    Returns:
+        List of (start, stop) tuples, stop exclusive
+    """
+    days = stop_day - start_day
+    parts = max(1, min(parts, days))
+    size, extra = divmod(days, parts)
+    slices = []
+    start = start_day
+    for index in range(parts):
+        stop = start + size + (1 if index < extra else 0)
+        slices.append((start, stop))
+        start = stop
+    return slices
+
+def plan_workers(days):
+    """
+    Decide how many worker processes a report over days should use.
+    Ranges shorter than REPORT_PARALLEL_MIN_DAYS, or REPORT_WORKERS set to
+    0 or 1, run serially in the calling process.
+    Returns:
+        Number of partitions, 1 for serial
+    """
+    config = current_app.config if has_app_context() else {}
+    workers = config.get('REPORT_WORKERS')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    min_days = config.get('REPORT_PARALLEL_MIN_DAYS', 365)
+    if workers <= 1 or days < min_days:
+        return 1
+    return min(workers, days)
+
+def _run(function, slices):
+    database = os.path.abspath(db.get_database_path())
+    if len(slices) == 1:
+        return [function(database, *slices[0])]
+    executor = get_executor(len(slices))
+    futures = [executor.submit(function, database, start, stop) for start, stop in slices]
+    return [future.result() for future in futures]
+
+def occupied_counts(start_date, end_date):
+    """
+    Count occupied rooms per day over a date range, partitioning long
+    ranges across worker processes.
+    Args:
+        start_date: First date (YYYY-MM-DD)
+        end_date: Last date (YYYY-MM-DD, inclusive)
+    Returns:
+        List of occupied room counts, one per day
+    """
+    start_day, end_day = occupancy.day_range(start_date, end_date)
+    if end_day < start_day:
+        return []
+    slices = split_days(start_day, end_day + 1, plan_workers(end_day - start_day + 1))
+    # Partitions take inclusive end days
+    parts = _run(occupancy_partition, [(start, stop - 1) for start, stop in slices])
+    return [count for part in parts for count in part]
+
+def revenue_by_room_type(start_date, end_date):
+    """
+    Sum room revenue per room type for the nights in a date range,
+    partitioning long ranges across worker processes.
+    Args:
+        start_date: Start date (YYYY-MM-DD)
+        end_date: End date (YYYY-MM-DD, exclusive for nights)
+    Returns:
+        Dictionary of room type: revenue
+    """
+    start_day, stop_day = occupancy.day_range(start_date, end_date)
+    if stop_day <= start_day:
+        return {}
+    slices = split_days(start_day, stop_day, plan_workers(stop_day - start_day))
+    totals = {}
+    for part in _run(revenue_partition, slices):
+        for kind, revenue in part.items():
+            totals[kind] = totals.get(kind, 0) + revenue
+    return totals
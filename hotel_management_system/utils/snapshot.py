@@ -0,0 +1,254 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from flask import current_app
+from . import db, occupancy
+from .occupancy import np
+
+SNAPSHOT_MAGIC = b'HMSSNAP1'
+SNAPSHOT_VERSION = 1
+
+# Booking statuses are stored as small integer codes
+STATUSES = ('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+CANCELLED = STATUS_CODES['cancelled']
+
+# Snapshot columns and their array typecodes; check-in/out are day ordinals
+COLUMNS = (
+    ('booking_id', 'q'),
+    ('room_id', 'i'),
+    ('check_in', 'i'),
+    ('check_out', 'i'),
+    ('status', 'b'),
+    ('room_type', 'h'),
+    ('price', 'd'),
+)
+
+# Loaded snapshots by path: (file mtime, BookingSnapshot)
+_snapshots = {}
+# Snapshots replaced by a newer file, by path. Each is unmapped at the
+# following swap, so requests still reading it when it was replaced finish
+_retired = {}
+_snapshots_lock = threading.Lock()
+
+def get_snapshot_path():
+    """
+    Get the snapshot file of the configured database.
+    Returns:
+        SNAPSHOT_PATH, or the database path with a .snapshot suffix
+    """
+    return current_app.config.get('SNAPSHOT_PATH') or db.get_database_path() + '.snapshot'
+
+def build_snapshot(path=None):
+    """
+    Materialise all bookings into typed column arrays and write them to a
+    memory-mappable snapshot file. The file is replaced atomically, so
+    readers never see a partial snapshot.
+    Args:
+        path: Snapshot file, defaults to get_snapshot_path()
+    Returns:
+        Number of bookings in the snapshot
+    """
+    path = path or get_snapshot_path()
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    room_types = {}
+
+    rows = db.iter_query(f'''
+        SELECT b.id, b.room_id, b.status, r.type, r.price,
+               {occupancy.sql_day('b.check_in')} as check_in_day,
+               {occupancy.sql_day('b.check_out')} as check_out_day
+        FROM bookings b
+        JOIN rooms r ON b.room_id = r.id
+        ORDER BY b.id
+    ''')
+    for row in rows:
+        columns['booking_id'].append(row['id'])
+        columns['room_id'].append(row['room_id'])
+        columns['check_in'].append(row['check_in_day'])
+        columns['check_out'].append(row['check_out_day'])
+        columns['status'].append(STATUS_CODES.get(row['status'], CANCELLED))
+        columns['room_type'].append(room_types.setdefault(row['type'], len(room_types)))
+        columns['price'].append(row['price'])
+
+    # Lay the columns out back to back, each aligned to 8 bytes
+    layout = []
+    offset = 0
+    for name, typecode in COLUMNS:
+        size = len(columns[name]) * columns[name].itemsize
+        layout.append({'name': name, 'typecode': typecode, 'offset': offset, 'size': size})
+        offset += (size + 7) // 8 * 8
+    header = json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'byteorder': sys.byteorder,
+        'count': len(columns['booking_id']),
+        'built_at': time.time(),
+        'room_types': list(room_types),
+        'columns': layout,
+    }).encode()
+    # Data starts on an 8-byte boundary after magic, header length and header
+    data_start = (len(SNAPSHOT_MAGIC) + 4 + len(header) + 7) // 8 * 8
+
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for column in layout:
+            f.seek(data_start + column['offset'])
+            columns[column['name']].tofile(f)
+        # Pad to the full layout so every column offset lies inside the file
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+    return len(columns['booking_id'])
+
+class BookingSnapshot:
+    """
+    Read-only view of a snapshot file. Columns are memory-mapped, not
+    copied: NumPy arrays when NumPy is installed, memoryviews otherwise.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Snapshot file written by build_snapshot
+        Raises:
+            ValueError if the file is not a readable snapshot
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic_size = len(SNAPSHOT_MAGIC)
+        if self._mmap[:magic_size] != SNAPSHOT_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Not a booking snapshot: {path}")
+        header_size = struct.unpack('<I', self._mmap[magic_size:magic_size + 4])[0]
+        header = json.loads(self._mmap[magic_size + 4:magic_size + 4 + header_size])
+        if header['version'] != SNAPSHOT_VERSION or header['byteorder'] != sys.byteorder:
+            self._mmap.close()
+            raise ValueError(f"Incompatible booking snapshot: {path}")
+
+        data_start = (magic_size + 4 + header_size + 7) // 8 * 8
+        self.count = header['count']
+        self.built_at = header['built_at']
+        self.room_types = header['room_types']
+        self.columns = {}
+        view = memoryview(self._mmap)
+        for column in header['columns']:
+            start = data_start + column['offset']
+            if np is not None:
+                self.columns[column['name']] = np.frombuffer(
+                    self._mmap, dtype=np.dtype(column['typecode']), count=self.count, offset=start
+                )
+            else:
+                self.columns[column['name']] = view[start:start + column['size']].cast(column['typecode'])
+
+    def __len__(self):
+        return self.count
+
+    def stays(self, start_day, stop_day):
+        """
+        Select the non-cancelled stays overlapping a window.
+        Args:
+            start_day: First day of the window (ordinal)
+            stop_day: Day the window stops (ordinal, exclusive)
+        Returns:
+            Tuple of (check_ins, check_outs, prices, room_type codes)
+        """
+        check_ins = self.columns['check_in']
+        check_outs = self.columns['check_out']
+        status = self.columns['status']
+        prices = self.columns['price']
+        room_types = self.columns['room_type']
+        if np is not None:
+            keep = (status != CANCELLED) & (check_ins < stop_day) & (check_outs > start_day)
+            return check_ins[keep], check_outs[keep], prices[keep], room_types[keep]
+        keep = [i for i in range(self.count)
+                if status[i] != CANCELLED and check_ins[i] < stop_day and check_outs[i] > start_day]
+        return ([check_ins[i] for i in keep], [check_outs[i] for i in keep],
+                [prices[i] for i in keep], [room_types[i] for i in keep])
+
+    def occupancy(self, start_date, end_date):
+        """
+        Count occupied rooms per day, e.g. for occupancy reports and
+        on-the-books forecasts of future dates.
+        Args:
+            start_date: First date (YYYY-MM-DD)
+            end_date: Last date (YYYY-MM-DD, inclusive)
+        Returns:
+            Dictionary of date: occupied rooms
+        """
+        start_day, end_day = occupancy.day_range(start_date, end_date)
+        check_ins, check_outs, _, _ = self.stays(start_day, end_day + 1)
+        counts = occupancy.count_occupied(check_ins, check_outs, start_day, end_day)
+        return dict(zip(occupancy.day_labels(start_day, end_day), counts))
+
+    def revenue_by_room_type(self, start_date, end_date):
+        """
+        Sum room revenue per room type for the nights in a range.
+        Args:
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD, exclusive for nights)
+        Returns:
+            Dictionary of room type: revenue
+        """
+        start_day, stop_day = occupancy.day_range(start_date, end_date)
+        check_ins, check_outs, prices, room_types = self.stays(start_day, stop_day)
+        _, totals = occupancy.revenue_by_type(
+            check_ins, check_outs, prices, room_types, start_day, stop_day
+        )
+        return {self.room_types[int(code)]: float(total) for code, total in totals.items()}
+
+    def close(self):
+        """
+        Unmap the file. Column arrays must no longer be used afterwards.
+        """
+        self.columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Arrays handed out still reference the map; it closes with them
+            pass
+
+def get_snapshot(max_age=None):
+    """
+    Get the booking snapshot, rebuilding it when missing or older than
+    max_age seconds. Loaded snapshots are shared within the process until
+    the file changes; a replaced snapshot is unmapped at the change after.
+    Args:
+        max_age: Maximum age in seconds, defaults to SNAPSHOT_MAX_AGE
+    Returns:
+        BookingSnapshot
+    """
+    path = get_snapshot_path()
+    if max_age is None:
+        max_age = current_app.config.get('SNAPSHOT_MAX_AGE', 300)
+
+    with _snapshots_lock:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if mtime is None or time.time() - mtime > max_age:
+            build_snapshot(path)
+            mtime = os.path.getmtime(path)
+
+        cached = _snapshots.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            snapshot = BookingSnapshot(path)
+        except ValueError:
+            build_snapshot(path)
+            mtime = os.path.getmtime(path)
+            snapshot = BookingSnapshot(path)
+        if cached is not None:
+            previous = _retired.pop(path, None)
+            if previous is not None:
+                previous.close()
+            _retired[path] = cached[1]
+        _snapshots[path] = (mtime, snapshot)
+        return snapshot
@@ -1,10 +1,14 @@
+import sqlite3
 from flask import current_app
 from datetime import datetime, timedelta
-from . import db
+from . import db, availability, identity, kpis, refdata, report_cache
+
+# Tables written when a booking is made or cancelled
+BOOKING_TABLES = ('bookings', 'room_nights', 'daily_kpis', 'rooms')
 
 def get_user_profile(user_id):
     """
-    Get the user profile information.
+    Get the user profile information, fetched at most once per request.
     
     Args:
         user_id: ID of the user
@@ -12,15 +16,11 @@ def get_user_profile(user_id):
     Returns:
         User profile data or None if not found
     """
-    return db.query_db(
-        'SELECT * FROM users WHERE id = ?',
-        [user_id],
-        one=True
-    )
+    return identity.load_user(user_id)
 
 def get_guest_profile(user_id):
     """
-    Get the guest profile for a user.
+    Get the guest profile for a user, fetched at most once per request.
     
     Args:
         user_id: ID of the user
@@ -28,11 +28,7 @@ def get_guest_profile(user_id):
     Returns:
         Guest profile data or None if not found
     """
-    return db.query_db(
-        'SELECT * FROM guests WHERE user_id = ?',
-        [user_id],
-        one=True
-    )
+    return identity.load_guest(user_id)
 
 def create_guest_profile(user_id, name, phone, address):
     """
@@ -65,7 +61,11 @@ def create_guest_profile(user_id, name, phone, address):
         'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
-    return db.insert_db('guests', data)
+    guest_id = db.insert_db('guests', data)
+    if guest_id:
+        identity.invalidate()
+    
+    return guest_id
 
 def update_guest_profile(guest_id, data):
     """
@@ -85,7 +85,11 @@ def update_guest_profile(guest_id, data):
         [guest_id]
     )
     
-    return rows_affected is not None and rows_affected > 0
+    if not rows_affected:
+        return False
+    
+    identity.invalidate()
+    return True
 
 def get_user_bookings(guest_id, include_cancelled=False):
     """
@@ -149,31 +153,20 @@ def get_available_rooms(check_in, check_out, room_type=None):
     Returns:
         List of available rooms
     """
-    # Base query for all rooms
-    query = '''
+    room_ids = availability.free_rooms(check_in, check_out, room_type)
+    
+    if not room_ids:
+        return []
+    
+    placeholders = ', '.join(['?'] * len(room_ids))
+    query = f'''
         SELECT r.*
         FROM rooms r
-        WHERE r.id NOT IN (
-            SELECT b.room_id
-            FROM bookings b
-            WHERE b.status IN ('confirmed', 'checked_in')
-            AND (
-                (b.check_in <= ? AND b.check_out > ?) OR
-                (b.check_in < ? AND b.check_out >= ?) OR
-                (b.check_in >= ? AND b.check_out <= ?)
-            )
-        )
+        WHERE r.id IN ({placeholders})
+        ORDER BY r.price, r.room_number
     '''
-    params = [check_out, check_in, check_out, check_in, check_in, check_out]
     
-    # Add room type filter if specified
-    if room_type:
-        query += ' AND r.type = ?'
-        params.append(room_type)
-    
-    query += ' ORDER BY r.price, r.room_number'
-    
-    return db.query_db(query, params)
+    return db.query_db(query, room_ids)
 
 def create_booking(guest_id, room_id, check_in, check_out):
     """
@@ -200,35 +193,43 @@ def create_booking(guest_id, room_id, check_in, check_out):
     if check_in_date < today:
         return None, "Check-in date cannot be in the past"
     
-    # Get available rooms
-    available_rooms = get_available_rooms(check_in, check_out)
-    room_ids = [room['id'] for room in available_rooms]
-    
-    if int(room_id) not in room_ids:
+    if not availability.is_room_free(room_id, check_in, check_out):
         return None, "Room is not available for the selected dates"
     
-    data = {
-        'guest_id': guest_id,
-        'room_id': room_id,
-        'check_in': check_in,
-        'check_out': check_out,
-        'status': 'confirmed',
-        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    booking_id = db.insert_db('bookings', data)
+    def reserve(conn):
+        cursor = conn.execute(
+            '''
+            INSERT INTO bookings (guest_id, room_id, check_in, check_out, status, created_at)
+            VALUES (?, ?, ?, ?, 'confirmed', ?)
+            ''',
+            [guest_id, room_id, check_in, check_out, datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        )
+        booking_id = cursor.lastrowid
+        
+        # Fails on the unique (room_id, night) key if another booking got there first
+        availability.claim_nights(conn, booking_id, room_id, check_in, check_out)
+        kpis.apply_stay(conn, room_id, check_in, check_out)
+        
+        # Update room status if check-in is today
+        if check_in_date == today:
+            conn.execute("UPDATE rooms SET status = 'occupied' WHERE id = ?", [room_id])
+        
+        return booking_id
     
-    if not booking_id:
+    try:
+        booking_id = db.run_write(reserve, tables=BOOKING_TABLES)
+    except sqlite3.IntegrityError:
+        availability.invalidate()
+        return None, "Room is not available for the selected dates"
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Booking error: {str(e)}")
         return None, "Failed to create booking"
     
-    # Update room status if check-in is today
+    availability.booking_added(booking_id, room_id, check_in, check_out)
+    report_cache.invalidate_range(check_in, check_out)
     if check_in_date == today:
-        db.update_db(
-            'rooms',
-            {'status': 'occupied'},
-            'id = ?',
-            [room_id]
-        )
+        # The room was marked occupied
+        refdata.invalidate('rooms')
     
     return booking_id, "Booking successful"
 
@@ -260,24 +261,41 @@ def cancel_booking(booking_id, guest_id):
     if check_in - now < timedelta(hours=24) and booking['status'] != 'pending':
         return False, "Booking cannot be cancelled within 24 hours of check-in"
     
-    success = db.update_db(
-        'bookings',
-        {'status': 'cancelled'},
-        'id = ? AND guest_id = ?',
-        [booking_id, guest_id]
-    )
+    def cancel(conn):
+        cursor = conn.execute(
+            '''
+            UPDATE bookings SET status = 'cancelled'
+            WHERE id = ? AND guest_id = ? AND status NOT IN ('checked_out', 'cancelled')
+            ''',
+            [booking_id, guest_id]
+        )
+        if cursor.rowcount == 0:
+            return False
+        
+        availability.release_nights(conn, booking['id'])
+        kpis.apply_stay(conn, booking['room_id'], booking['check_in'], booking['check_out'], -1)
+        
+        # If room was occupied, update room status
+        if booking['status'] == 'checked_in':
+            conn.execute(
+                "UPDATE rooms SET status = 'available' WHERE id = ?",
+                [booking['room_id']]
+            )
+        return True
+    
+    try:
+        success = db.run_write(cancel, tables=BOOKING_TABLES)
+    except sqlite3.Error as e:
+        current_app.logger.error(f"Cancellation error: {str(e)}")
+        success = False
     
     if not success:
         return False, "Failed to cancel booking"
     
-    # If room was occupied, update room status
+    availability.booking_removed(booking['id'])
+    report_cache.invalidate_range(booking['check_in'], booking['check_out'])
     if booking['status'] == 'checked_in':
-        db.update_db(
-            'rooms',
-            {'status': 'available'},
-            'id = ?',
-            [booking['room_id']]
-        )
+        refdata.invalidate('rooms')
     
     return True, "Booking cancelled successfully"
 
@@ -544,8 +562,8 @@ def get_room_details(room_id):
     Returns:
         Room details or None if not found
     """
-    return db.query_db(
+    return refdata.cached('rooms', ('details', room_id), lambda: db.query_db(
         'SELECT * FROM rooms WHERE id = ?',
         [room_id],
         one=True
-    )
\ No newline at end of file
+    ))
\ No newline at end of file
@@ -0,0 +1,202 @@
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from .pool import DEFAULT_PRAGMAS
+
+class WriteQueue:
+    """
+    Funnels every mutation through a single writer thread.
+
+    Jobs are callables taking the writer's connection. Whatever is queued
+    while a batch is running is committed together in the next transaction;
+    each job runs inside its own savepoint so one failing job does not undo
+    the rest of its batch.
+    """
+
+    def __init__(self, database, pragmas=None, max_batch=64):
+        """
+        Args:
+            database: Path to the SQLite database file
+            pragmas: Dictionary of PRAGMA name: value pairs, merged over the defaults
+            max_batch: Maximum number of jobs committed in one transaction
+        """
+        self.database = database
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the writer thread if it is not already running.
+        """
+        with self._lock:
+            self._start_locked()
+
+    def _start_locked(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='sqlite-writer', daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, operation):
+        """
+        Queue a write and wait for it to be committed.
+        Args:
+            operation: Callable receiving the writer connection
+        Returns:
+            Whatever the operation returned
+        Raises:
+            The operation's exception, or the commit error for its batch
+        """
+        return self.submit_async(operation).result()
+
+    def submit_async(self, operation):
+        """
+        Queue a write without waiting for it.
+        Args:
+            operation: Callable receiving the writer connection
+        Returns:
+            concurrent.futures.Future resolved once the batch commits
+        """
+        future = Future()
+        # Queue under the lock so a writer thread that is giving up cannot
+        # miss the job: it drains the queue under the same lock
+        with self._lock:
+            self._start_locked()
+            self._jobs.put((operation, future))
+        return future
+
+    def close(self, timeout=None):
+        """
+        Stop the writer thread after it drains the jobs already queued.
+        Args:
+            timeout: Seconds to wait for the thread to finish
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._jobs.put(None)
+            thread.join(timeout)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _fail_pending(self, error):
+        """
+        Fail every queued job and let the next submit start a new thread.
+        """
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None and not job[1].done():
+                    job[1].set_exception(error)
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._fail_pending(e)
+            return
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                batch = [job]
+                stop = False
+                while len(batch) < self.max_batch:
+                    try:
+                        job = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stop = True
+                        break
+                    batch.append(job)
+                self._commit_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for operation, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT write_job')
+                try:
+                    result = operation(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute('RELEASE write_job')
+                    outcomes.append((future, result, None))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # Also reached when BEGIN itself fails (e.g. SQLITE_BUSY), before
+            # any job started: every job of the batch must still resolve
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for operation, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+_queues = {}
+_queues_lock = threading.Lock()
+_queues_pid = os.getpid()
+
+def get_write_queue(database, **options):
+    """
+    Get the process-wide write queue for a database, creating it on first use.
+    Args:
+        database: Path to the SQLite database file
+        options: Keyword arguments passed to WriteQueue on creation
+    Returns:
+        WriteQueue for the database
+    """
+    global _queues_pid
+    key = os.path.abspath(database) if database != ':memory:' else database
+    with _queues_lock:
+        if _queues_pid != os.getpid():
+            _queues.clear()
+            _queues_pid = os.getpid()
+        write_queue = _queues.get(key)
+        if write_queue is None:
+            write_queue = _queues[key] = WriteQueue(database, **options)
+        return write_queue
+
+def close_all_write_queues():
+    """
+    Drain and stop every write queue created in this process.
+    """
+    with _queues_lock:
+        for write_queue in _queues.values():
+            write_queue.close()
+        _queues.clear()